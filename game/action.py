@@ -5,6 +5,8 @@
 import attrs
 from tcod.ec import ComponentDict
 
+import game.profiling
+
 
 class Action:
     def __init__(self, data: Iterable[object]) -> None:
@@ -18,6 +20,7 @@ def execute(self, world: ComponentDict, actor: ComponentDict) -> Success:
         """Force this action to be performed."""
         raise NotImplementedError()
 
+    @game.profiling.timed("perform")
     def perform(self, world: ComponentDict, actor: ComponentDict) -> ActionResult:
         result = self.poll(world, actor)
         if not isinstance(result, Action):
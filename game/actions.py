@@ -3,6 +3,7 @@
 from tcod.ec import ComponentDict
 
 import game.actor_tools
+import game.fields
 import game.map_tools
 from game.action import Action, Impossible, PollResult, Success
 from game.components import Context, Direction, MapFeatures, Player, Position, Stairway
@@ -18,13 +19,14 @@ def poll(self, world: ComponentDict, actor: ComponentDict) -> PollResult:
         active_map = context.active_map[Map]
         if not (0 <= dest.x < active_map.width and 0 <= dest.y < active_map.height):
             return Impossible("Blocked.")
-        if world[TileDB].data["walk_cost"][active_map[a_tiles][dest.yx]] > 0:
+        if world[TileDB].walkable[active_map[a_tiles][dest.yx]]:
             return self
         return Impossible("Blocked.")
 
     def execute(self, world: ComponentDict, actor: ComponentDict) -> Success:
         dest = actor[Position] + self.data[Direction]
         actor[Position] = dest
+        game.fields.emit(world, game.fields.SOUND, dest, game.fields.FOOTSTEP_SOUND)
         if Player in actor:
             game.actor_tools.compute_fov(world, actor)
         return Success(time_passed=100)
@@ -57,7 +59,6 @@ def get_stairs(self, world: ComponentDict, actor: ComponentDict) -> PassageInfo
             if next_map_key is None:
                 continue
             for exit_passage in self.iter_stairs(game.map_tools.get_map(world, next_map_key)):
-                print(exit_passage[Stairway])
                 if getattr(exit_passage[Stairway], inverse_dir) is None:
                     continue
                 return self.PassageInfo(stairs, exit_passage, next_map_key)
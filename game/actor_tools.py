@@ -4,14 +4,19 @@
 import numpy as np
 import tcod.libtcodpy
 import tcod.map
+from numpy.typing import NDArray
 from tcod.ec import ComponentDict
 
 import game.map_attrs
+import game.profiling
 from game.actor_types import ActiveFOV, Memory, MemoryLayer
 from game.components import Context, Graphic, MapFeatures, Position
 from game.map import Map
 from game.tiles import TileDB
 
+FOV_RADIUS = 10
+"""How far actors can see, FOV is only computed on a window of this radius around the viewer."""
+
 
 def new_actor(world: ComponentDict, components: Iterable[object] = ()) -> ComponentDict:
     ctx = world[Context]
@@ -28,13 +33,28 @@ def get_memory(world: ComponentDict, actor: ComponentDict) -> MemoryLayer:
         actor[Memory] = Memory()
     memory = actor[Memory]
     if active_map not in memory.layers:
-        memory.layers[active_map] = MemoryLayer(
-            tiles=np.zeros_like(active_map[Map][game.map_attrs.a_tiles]),
-            objs={},
-        )
+        memory.layers[active_map] = MemoryLayer.new((active_map[Map].height, active_map[Map].width))
     return memory.layers[active_map]
 
 
+def get_fov_window(
+    world: ComponentDict, map_entity: ComponentDict, pos: Position, radius: int
+) -> tuple[NDArray[np.bool_], Position]:
+    """Return the area visible from `pos` on a map, as a window around `pos` and the position of its top-left corner."""
+    map = map_entity[Map]
+    top, left = max(0, pos.y - radius), max(0, pos.x - radius)
+    bottom, right = min(map.height, pos.y + radius + 1), min(map.width, pos.x + radius + 1)
+    transparency = world[TileDB].transparent[map[game.map_attrs.a_tiles][top:bottom, left:right]]
+    visible = tcod.map.compute_fov(
+        transparency=transparency,
+        pov=(pos.y - top, pos.x - left),
+        radius=radius,
+        algorithm=tcod.libtcodpy.FOV_SYMMETRIC_SHADOWCAST,
+    )
+    return visible, Position(left, top)
+
+
+@game.profiling.timed("compute_fov")
 def compute_fov(world: ComponentDict, actor: ComponentDict, update_memory: bool = True) -> ActiveFOV:
     """Lazy compute the visible area from an actor and return the result.
 
@@ -46,21 +66,14 @@ def compute_fov(world: ComponentDict, actor: ComponentDict, update_memory: bool
     if fov and fov.active_map is active_map and fov.active_pos == actor_pos:
         return fov
 
-    tile_db = world[TileDB]
-    transparency = tile_db.data["transparent"][active_map[Map][game.map_attrs.a_tiles]]
-    fov = ActiveFOV(
-        visible=tcod.map.compute_fov(
-            transparency=transparency, pov=actor_pos.yx, radius=10, algorithm=tcod.libtcodpy.FOV_SYMMETRIC_SHADOWCAST
-        ),
-        active_map=active_map,
-        active_pos=actor_pos,
-    )
+    visible, origin = get_fov_window(world, active_map, actor_pos, FOV_RADIUS)
+    fov = ActiveFOV(visible=visible, active_map=active_map, active_pos=actor_pos, origin=origin)
     if update_memory:
         memory = get_memory(world, actor)
-        memory.tiles = np.where(fov.visible, active_map[Map][game.map_attrs.a_tiles], memory.tiles)
+        memory.remember(fov.visible, fov.origin)
 
         for old_pos in list(memory.objs.keys()):
-            if fov.visible[old_pos.yx]:
+            if fov.is_visible(old_pos):
                 del memory.objs[old_pos]
 
         for obj in itertools.chain(
@@ -68,8 +81,8 @@ def compute_fov(world: ComponentDict, actor: ComponentDict, update_memory: bool
             world[Context].actors,
         ):
             pos = obj[Position]
-            if fov.visible[pos.yx]:
-                memory.objs[pos] = obj
+            if fov.is_visible(pos):
+                memory.objs[pos] = obj[Graphic]
 
     actor[ActiveFOV] = fov
     return fov
@@ -1,3 +1,4 @@
+from typing import Any, Self
 from weakref import WeakKeyDictionary
 
 import attrs
@@ -5,22 +6,129 @@
 from numpy.typing import NDArray
 from tcod.ec import ComponentDict
 
-from game.components import Position
+import game.dirty_rows
+from game.components import Graphic, Position
+
+
+def _window_contains(window: NDArray[np.bool_], origin: Position, pos: Position) -> bool:
+    """Return True if `pos` is a True cell of a `window` of a map with its top-left corner at `origin`."""
+    y, x = pos.y - origin.y, pos.x - origin.x
+    return 0 <= y < window.shape[0] and 0 <= x < window.shape[1] and bool(window[y, x])
 
 
 @attrs.define()
 class MemoryLayer:
-    tiles: NDArray[np.intc]
-    objs: dict[Position, ComponentDict]
+    """An actors memory of one map.
+
+    The remembered tile at a seen position is the current tile of the map,
+    unless the map was changed after it was seen in which case `overrides` holds the tile which was seen.
+
+    >>> layer = MemoryLayer.new((2, 10))
+    >>> tiles = np.arange(20, dtype=np.uint8).reshape(2, 10)
+    >>> visible = np.ones((1, 2), dtype=bool)  # A window of the map with its top-left corner at (8, 0).
+    >>> layer.remember(visible, Position(8, 0))
+    >>> layer.overrides[Position(9, 0)] = 99  # The tile at (9, 0) was changed after it was seen.
+    >>> layer.get_tiles(tiles).tolist()
+    [[0, 0, 0, 0, 0, 0, 0, 0, 8, 99], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0]]
+    >>> layer.is_seen(Position(8, 0)), layer.is_seen(Position(8, 1))
+    (True, False)
+    >>> layer.seen.nbytes  # One bit per cell.
+    4
+    """
+
+    shape: tuple[int, int]
+    """The (height, width) of the remembered map."""
+    seen: NDArray[np.uint8]
+    """A bit-packed mask of positions which were ever seen, packed along the last axis."""
+    overrides: dict[Position, int] = attrs.Factory(dict)
+    """Remembered tile ids which are no longer the tiles of the map."""
+    objs: dict[Position, Graphic] = attrs.Factory(dict)
+    """The remembered appearance of objects, by position."""
+
+    @classmethod
+    def new(cls, shape: tuple[int, int]) -> Self:
+        """Return an empty memory of a map of `shape`."""
+        return cls(shape, np.zeros((shape[0], -(-shape[1] // 8)), dtype=np.uint8))
+
+    def is_seen(self, pos: Position) -> bool:
+        return bool(self.seen[pos.y, pos.x // 8] & (0x80 >> pos.x % 8))
+
+    def get_seen(self, world_slice: tuple[slice, ...] = np.s_[:, :]) -> NDArray[np.bool_]:
+        """Return the unpacked seen mask of an area."""
+        rows = np.unpackbits(self.seen[world_slice[0]], axis=1, count=self.shape[1])
+        return rows[:, world_slice[1]].view(np.bool_)
+
+    def get_tiles(self, tiles: NDArray[Any], world_slice: tuple[slice, ...] = np.s_[:, :]) -> NDArray[Any]:
+        """Return the remembered tile ids of an area, 0 where nothing is remembered.
+
+        `tiles` is the full tile array of the map this layer remembers.
+        """
+        remembered = np.where(self.get_seen(world_slice), tiles[world_slice], 0).astype(tiles.dtype)
+        if self.overrides:
+            i_start, i_stop, _ = world_slice[0].indices(self.shape[0])
+            j_start, j_stop, _ = world_slice[1].indices(self.shape[1])
+            for pos, tile in self.overrides.items():
+                if i_start <= pos.y < i_stop and j_start <= pos.x < j_stop:
+                    remembered[pos.y - i_start, pos.x - j_start] = tile
+        return remembered
+
+    def remember(self, visible: NDArray[np.bool_], origin: Position = Position(0, 0)) -> None:
+        """Mark the `visible` area as seen, which also drops any overrides there since the current tiles are seen.
+
+        `visible` is a window of the map with its top-left corner at `origin`.
+        Only the bytes of `seen` covering the window are unpacked and updated.
+        """
+        height, width = visible.shape
+        byte_start, byte_stop = origin.x // 8, -(-(origin.x + width) // 8)
+        bit_offset = origin.x - byte_start * 8
+        rows = self.seen[origin.y : origin.y + height, byte_start:byte_stop]
+        bits = np.unpackbits(rows, axis=1)
+        bits[:, bit_offset : bit_offset + width] |= visible
+        rows[:] = np.packbits(bits, axis=1)
+        game.dirty_rows.mark(self.seen, origin.y, origin.y + height)
+        for pos in [pos for pos in self.overrides if _window_contains(visible, origin, pos)]:
+            del self.overrides[pos]
 
 
 @attrs.define()
 class Memory:
     layers: WeakKeyDictionary[ComponentDict, MemoryLayer] = attrs.field(factory=WeakKeyDictionary)
 
+    def __getstate__(self) -> list[tuple[ComponentDict, MemoryLayer]]:
+        """Pickle the layers as pairs since a WeakKeyDictionary can not be pickled directly."""
+        return list(self.layers.items())
+
+    def __setstate__(self, state: Any) -> None:
+        self.layers = WeakKeyDictionary(state)
+
 
 @attrs.define()
 class ActiveFOV:
+    """The area seen by an actor, only a window around the actor is kept since vision has a limited radius."""
+
     visible: NDArray[np.bool_]
+    """The visible mask of the window."""
     active_map: ComponentDict
     active_pos: Position
+    origin: Position = Position(0, 0)
+    """The map position of the top-left corner of `visible`."""
+
+    def is_visible(self, pos: Position) -> bool:
+        return _window_contains(self.visible, self.origin, pos)
+
+    def get_visible(self, world_slice: tuple[slice, ...]) -> NDArray[np.bool_]:
+        """Return the visible mask of an area of the map, False outside of the window.
+
+        `world_slice` must have explicit bounds, such as the slices from `tcod.camera.get_slices`.
+        """
+        i_start, i_stop = world_slice[0].start, world_slice[0].stop
+        j_start, j_stop = world_slice[1].start, world_slice[1].stop
+        out = np.zeros((i_stop - i_start, j_stop - j_start), dtype=np.bool_)
+        top, left = max(i_start, self.origin.y), max(j_start, self.origin.x)
+        bottom = min(i_stop, self.origin.y + self.visible.shape[0])
+        right = min(j_stop, self.origin.x + self.visible.shape[1])
+        if top < bottom and left < right:
+            out[top - i_start : bottom - i_start, left - j_start : right - j_start] = self.visible[
+                top - self.origin.y : bottom - self.origin.y, left - self.origin.x : right - self.origin.x
+            ]
+        return out
@@ -0,0 +1,98 @@
+"""Periodic saving of the world on a background thread.
+
+The owner of the world calls `Autosave.update` whenever the world is waiting on the player.
+Once the interval has passed a snapshot is taken there: maps which may have changed are pickled with copies of their
+arrays, unchanged maps reuse their records from the previous snapshot, and the rest of the world is pickled.
+Writing the file is left to a background thread so only the snapshot step is spent on the simulation thread.
+
+Maps are assumed to only change while they are the active map.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from pathlib import Path
+
+from tcod.ec import ComponentDict
+
+import game.paths
+import game.save
+from game.components import Context, MapDict
+from game.map import MapKey
+
+logger = logging.getLogger(__name__)
+
+SAVE_FILE_NAME = "autosave.sav"
+
+
+def get_autosave_path() -> Path:
+    return game.paths.get_data_dir() / SAVE_FILE_NAME
+
+
+class Autosave:
+    """Saves snapshots of a world to `path` at most once every `interval` seconds."""
+
+    def __init__(self, path: Path, interval: float = 60.0) -> None:
+        self.path = path
+        self.interval = interval
+        self._last_snapshot = time.monotonic()
+        self._records: dict[MapKey, tuple[ComponentDict, game.save.Record]] = {}
+        """Records of each map from the last snapshot, along with the entity they were made from."""
+        self._touched: set[MapKey] = set()
+        """Maps which were active at some point since the last snapshot."""
+        self._pending: tuple[list[game.save.Record], game.save.Record] | None = None
+        """The newest snapshot which has not been written yet."""
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="Autosave", daemon=True)
+        self._thread.start()
+
+    def update(self, world: ComponentDict, *, force: bool = False) -> None:
+        """Note the active map and take a snapshot if one is due, or if `force` is True."""
+        ctx = world[Context]
+        for key, map_entity in world[MapDict].items():
+            if map_entity is ctx.active_map:
+                self._touched.add(key)
+                break
+        if force or time.monotonic() - self._last_snapshot >= self.interval:
+            self.snapshot(world)
+
+    def snapshot(self, world: ComponentDict) -> None:
+        """Pickle the changed parts of `world` and queue them to be written."""
+        start = time.perf_counter()
+        map_dict = world[MapDict]
+        records = {}
+        for key, map_entity in map_dict.items():
+            cached = self._records.get(key)
+            if cached is None or cached[0] is not map_entity or key in self._touched:
+                cached = map_entity, game.save.encode_map(map_entity).copy()
+            records[key] = cached
+        world_record = game.save.encode(world, game.save.get_persistent_ids(map_dict.values())).copy()
+        self._records = records
+        self._touched.clear()
+        self._last_snapshot = time.monotonic()
+        with self._condition:
+            self._pending = [record for _, record in records.values()], world_record
+            self._condition.notify()
+        logger.debug("Autosave snapshot took %.1f ms", (time.perf_counter() - start) * 1000)
+
+    def close(self) -> None:
+        """Finish writing any pending snapshot and stop the background thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None or self._closed)
+                pending, self._pending = self._pending, None
+                if pending is None:
+                    return
+            try:
+                game.save.write_records(self.path, *pending)
+            except OSError:
+                logger.exception("Failed to write autosave to %s", self.path)
@@ -23,6 +23,8 @@ class System(Enum):
     RIGHT = MoveDir(1, 0)
     CONFIRM = "CONFIRM"
     ESCAPE = "ESCAPE"
+    ZOOM_IN = "ZOOM_IN"
+    ZOOM_OUT = "ZOOM_OUT"
 
 
 keybindings.add_bind(System.UP, Bind(sym=KeySym.UP))
@@ -33,6 +35,24 @@ class System(Enum):
 keybindings.add_bind(System.CONFIRM, Bind(sym=KeySym.RETURN2))
 keybindings.add_bind(System.CONFIRM, Bind(sym=KeySym.KP_ENTER))
 keybindings.add_bind(System.ESCAPE, Bind(sym=KeySym.ESCAPE))
+keybindings.add_bind(System.ZOOM_IN, Bind(sym=KeySym.EQUALS, shift=None))
+keybindings.add_bind(System.ZOOM_IN, Bind(sym=KeySym.KP_PLUS))
+keybindings.add_bind(System.ZOOM_OUT, Bind(sym=KeySym.MINUS))
+keybindings.add_bind(System.ZOOM_OUT, Bind(sym=KeySym.KP_MINUS))
+
+
+@keybindings.register()
+class Debug(Enum):
+    """Developer tools, these keys work in any state."""
+
+    TOGGLE_PROFILER = "TOGGLE_PROFILER"
+    EXPORT_PROFILE = "EXPORT_PROFILE"
+    REWIND = "REWIND"
+
+
+keybindings.add_bind(Debug.TOGGLE_PROFILER, Bind(sym=KeySym.F3))
+keybindings.add_bind(Debug.EXPORT_PROFILE, Bind(sym=KeySym.F4))
+keybindings.add_bind(Debug.REWIND, Bind(sym=KeySym.F5))
 
 
 @keybindings.register()
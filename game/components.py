@@ -18,6 +18,13 @@ class Context:
     actors: set[ComponentDict] = Factory(set)
 
 
+@attrs.define(frozen=True)
+class Seed:
+    """The seed of a world, all levels are generated from it."""
+
+    value: int
+
+
 @attrs.define(frozen=True)
 class Position:
     x: int = 0
@@ -57,6 +64,21 @@ class Graphic:
     fg: tuple[int, int, int] = (255, 255, 255)
 
 
+@attrs.define(frozen=True)
+class Light:
+    """A light source, static when on a map feature and dynamic when on an actor."""
+
+    radius: int = 8
+    color: tuple[int, int, int] = (255, 255, 255)
+
+
+@attrs.define(frozen=True)
+class AmbientLight:
+    """The light level of a map away from any light source, maps without this are fully lit."""
+
+    color: tuple[int, int, int] = (255, 255, 255)
+
+
 @attrs.define(frozen=True)
 class Player:
     pass
@@ -82,6 +104,8 @@ class MapInfo:
     """Camera world to screen offset of the last render."""
     cursor: Position | None = None
     """Cursor world position."""
+    zoom: int = 1
+    """Overview reduction factor, 1 shows the map normally."""
 
 
 class MapDict(dict[MapKey, ComponentDict]):
@@ -0,0 +1,168 @@
+"""Connected regions of the walkable tiles of a map, so that reachability can be checked without a search.
+
+Regions are 8-connected since actors can move diagonally.
+"""
+
+from __future__ import annotations
+
+from typing import Self
+
+import numpy as np
+from numpy.typing import NDArray
+from tcod.ec import ComponentDict
+
+from game.components import Position
+from game.map import Map
+from game.map_attrs import a_tiles
+from game.tiles import TileDB
+
+EIGHT_CONNECTED = np.ones((3, 3), dtype=bool)
+
+
+def _label(walkable: NDArray[np.bool_]) -> tuple[NDArray[np.int32], int]:
+    import scipy.ndimage  # type: ignore  # SciPy is slow to import, so it's only loaded once regions are needed.
+
+    labels, count = scipy.ndimage.label(walkable, EIGHT_CONNECTED, output=np.int32)
+    return labels, int(count)
+
+
+class MapConnectivity:
+    """Region labels of a map, 0 for cells which can not be walked on.
+
+    This is stored as a component of a map entity and is refreshed lazily.
+    Call `update_tile` after changing a tile of a map, or `invalidate` after changing many tiles.
+
+    >>> walkable = np.array([[1, 1, 0, 1], [0, 1, 0, 1], [0, 0, 0, 1]], dtype=bool)
+    >>> regions = MapConnectivity.new(walkable)
+    >>> regions.labels.tolist()
+    [[1, 1, 0, 2], [0, 1, 0, 2], [0, 0, 0, 2]]
+    >>> regions.is_connected(Position(0, 0), Position(1, 1)), regions.is_connected(Position(0, 0), Position(3, 2))
+    (True, False)
+    >>> walkable[0, 0] = False
+    >>> regions.update(Position(0, 0), False)  # Shrinks a region in place.
+    >>> regions.region_size(1), regions.dirty
+    (2, False)
+    >>> walkable[1, 2] = True
+    >>> regions.update(Position(2, 1), True)  # Joins both regions, so the labels must be rebuilt.
+    >>> regions.dirty
+    True
+    >>> regions.rebuild(walkable)
+    >>> regions.is_connected(Position(1, 1), Position(3, 2)), regions.region_size(1)
+    (True, 6)
+    """
+
+    def __init__(self, labels: NDArray[np.int32], count: int) -> None:
+        self.labels = labels
+        """The region of each cell, regions are numbered from 1."""
+        self.count = count
+        """The highest region number, some numbers may be unused after updates."""
+        self.dirty = False
+        """True if the labels must be rebuilt before use."""
+        self._order: NDArray[np.intp] | None = None
+        """Flat indexes of the walkable cells sorted by region, built on demand for sampling."""
+        self._offsets: NDArray[np.intp] | None = None
+        """Start of each region in `_order`, indexed by region number."""
+
+    @classmethod
+    def new(cls, walkable: NDArray[np.bool_]) -> Self:
+        return cls(*_label(walkable))
+
+    def rebuild(self, walkable: NDArray[np.bool_]) -> None:
+        self.labels, self.count = _label(walkable)
+        self.dirty = False
+        self._order = self._offsets = None
+
+    def get_region(self, pos: Position) -> int:
+        """Return the region of `pos`, 0 if it can not be walked on or is out of bounds."""
+        if not (0 <= pos.y < self.labels.shape[0] and 0 <= pos.x < self.labels.shape[1]):
+            return 0
+        return int(self.labels[pos.y, pos.x])
+
+    def is_connected(self, a: Position, b: Position) -> bool:
+        """Return True if a walk from `a` to `b` exists."""
+        region = self.get_region(a)
+        return region != 0 and region == self.get_region(b)
+
+    def _get_index(self) -> tuple[NDArray[np.intp], NDArray[np.intp]]:
+        if self._order is None or self._offsets is None:
+            flat = self.labels.ravel()
+            self._order = np.argsort(flat, kind="stable")
+            self._offsets = np.concatenate([[0], np.cumsum(np.bincount(flat, minlength=self.count + 1))])
+        return self._order, self._offsets
+
+    def region_size(self, region: int) -> int:
+        _, offsets = self._get_index()
+        return int(offsets[region + 1] - offsets[region])
+
+    def sample(self, region: int, rng: np.random.Generator, count: int = 1) -> list[Position]:
+        """Return `count` random cells of `region`, cells may repeat.  The region must not be empty."""
+        order, offsets = self._get_index()
+        start, stop = offsets[region], offsets[region + 1]
+        assert start < stop, f"Region {region} is empty."
+        indexes = order[rng.integers(start, stop, size=count)]
+        ys, xs = np.unravel_index(indexes, self.labels.shape)
+        return [Position(x, y) for x, y in zip(xs.tolist(), ys.tolist())]
+
+    def update(self, pos: Position, is_walkable: bool) -> None:
+        """Update the labels after the walkability of `pos` changed.
+
+        Changes which only grow or shrink one region are applied in place,
+        changes which could join or split regions mark the labels as dirty instead.
+        """
+        if self.dirty or (self.labels[pos.y, pos.x] != 0) == is_walkable:
+            return
+        y0, x0 = max(0, pos.y - 1), max(0, pos.x - 1)
+        neighbors = self.labels[y0 : pos.y + 2, x0 : pos.x + 2]
+        if is_walkable:
+            regions = np.unique(neighbors[neighbors != 0])
+            if len(regions) > 1:
+                self.dirty = True  # Regions are joined.
+                return
+            if len(regions) == 1:
+                self.labels[pos.y, pos.x] = regions[0]
+            else:
+                self.count += 1
+                self.labels[pos.y, pos.x] = self.count
+        else:
+            ring = neighbors != 0
+            ring[pos.y - y0, pos.x - x0] = False
+            if _label(ring)[1] > 1:
+                self.dirty = True  # The region might be split.
+                return
+            self.labels[pos.y, pos.x] = 0
+        self._order = self._offsets = None
+
+
+def _get_walkable(world: ComponentDict, map_entity: ComponentDict) -> NDArray[np.bool_]:
+    walkable: NDArray[np.bool_] = world[TileDB].walkable[map_entity[Map][a_tiles]]
+    return walkable
+
+
+def get_connectivity(world: ComponentDict, map_entity: ComponentDict) -> MapConnectivity:
+    """Return the up to date regions of a map, building them if needed."""
+    regions = map_entity.get(MapConnectivity)
+    if regions is None:
+        regions = map_entity[MapConnectivity] = MapConnectivity.new(_get_walkable(world, map_entity))
+    elif regions.dirty:
+        regions.rebuild(_get_walkable(world, map_entity))
+    return regions
+
+
+def is_connected(world: ComponentDict, map_entity: ComponentDict, a: Position, b: Position) -> bool:
+    """Return True if a walk from `a` to `b` exists on a map."""
+    return get_connectivity(world, map_entity).is_connected(a, b)
+
+
+def update_tile(world: ComponentDict, map_entity: ComponentDict, pos: Position) -> None:
+    """Update the regions of a map after the tile at `pos` was changed."""
+    regions = map_entity.get(MapConnectivity)
+    if regions is None:
+        return
+    regions.update(pos, bool(world[TileDB].walkable[map_entity[Map][a_tiles][pos.yx]]))
+
+
+def invalidate(map_entity: ComponentDict) -> None:
+    """Mark the regions of a map for a rebuild, after changing an area of its tiles."""
+    regions = map_entity.get(MapConnectivity)
+    if regions is not None:
+        regions.dirty = True
@@ -0,0 +1,48 @@
+"""The rows of arrays changed in place, so that copies of large arrays only need to copy the rows which changed.
+
+Code changing a tracked array reports the changed rows with `mark`, the copier takes them with `pop`.
+Which arrays are tracked is decided by the copier, see `game.snapshots`.
+This module has no game imports so that any module can report its changes.
+"""
+
+from __future__ import annotations
+
+import functools
+import weakref
+from typing import Any
+
+from numpy.typing import NDArray
+
+_changes: dict[int, tuple[weakref.ref[NDArray[Any]], int, int]] = {}
+"""The reference, start row, and stop row of the changes of each array, keyed by `id()` of the array."""
+
+
+def _forget(key: int, _ref: weakref.ref[NDArray[Any]]) -> None:
+    _changes.pop(key, None)
+
+
+def mark(array: NDArray[Any], start: int, stop: int) -> None:
+    """Note that the rows from `start` to `stop` of `array` were changed.
+
+    >>> import numpy as np
+    >>> array = np.zeros((8, 2))
+    >>> mark(array, 5, 6)
+    >>> mark(array, 2, 3)
+    >>> pop(array), pop(array)
+    ((2, 6), None)
+    """
+    key = id(array)
+    entry = _changes.get(key)
+    if entry is not None and entry[0]() is array:
+        _changes[key] = entry[0], min(start, entry[1]), max(stop, entry[2])
+    else:
+        _changes[key] = weakref.ref(array, functools.partial(_forget, key)), start, stop
+
+
+def pop(array: NDArray[Any]) -> tuple[int, int] | None:
+    """Return the (start, stop) rows of `array` changed since the last call, or None if no rows changed."""
+    entry = _changes.get(id(array))
+    if entry is None or entry[0]() is not array:
+        return None
+    del _changes[id(array)]
+    return entry[1], entry[2]
@@ -0,0 +1,38 @@
+from typing import Iterable
+
+import tcod.event
+
+
+def coalesce(events: Iterable[tcod.event.Event], max_key_repeats: int = 1) -> list[tcod.event.Event]:
+    """Return a burst of raw SDL events with redundant events merged.
+
+    Consecutive mouse motion events with the same button state are merged into one event.
+    Key repeat events beyond `max_key_repeats` are dropped, this stops a held key from queuing up moves.
+    The order of all other events is kept.
+
+    >>> motions = [tcod.event.MouseMotion((10, 10), (1, 0)), tcod.event.MouseMotion((12, 11), (2, 1))]
+    >>> [(event.position, event.motion) for event in coalesce(motions)]
+    [(Point(x=12, y=11), Point(x=3, y=1))]
+    >>> repeats = [tcod.event.KeyDown(0, tcod.event.KeySym.UP, 0, repeat=True) for _ in range(5)]
+    >>> len(coalesce(repeats, max_key_repeats=2))
+    2
+    """
+    result: list[tcod.event.Event] = []
+    key_repeats = 0
+    for event in events:
+        match event:
+            case tcod.event.MouseMotion():
+                prev = result[-1] if result else None
+                if isinstance(prev, tcod.event.MouseMotion) and prev.state == event.state:
+                    result[-1] = tcod.event.MouseMotion(
+                        position=event.position,
+                        motion=(prev.motion[0] + event.motion[0], prev.motion[1] + event.motion[1]),
+                        state=event.state,
+                    )
+                    continue
+            case tcod.event.KeyDown(repeat=True):
+                key_repeats += 1
+                if key_repeats > max_key_repeats:
+                    continue
+        result.append(event)
+    return result
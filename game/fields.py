@@ -0,0 +1,366 @@
+"""Scalar fields such as scent and sound which spread through walkable tiles and fade over time.
+
+Each field of a map is a `FieldLayer` which only covers the area where the field may be non-zero plus a margin,
+so the memory taken by a field, the size of it in saves and snapshots, and the cost of updating it all depend on how
+far the field has spread and not on the size of the map.
+Only the active map is updated, once for each turn which passed since its last update.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import attrs
+import numpy as np
+from numpy.typing import NDArray
+from tcod.ec import ComponentDict
+
+import game.profiling
+from game.components import Context, Direction, Position
+from game.map import Map
+from game.map_attrs import a_tiles
+from game.tiles import TileDB
+
+TURN_TIME = 100
+"""Scheduler time of one turn."""
+MAX_STEPS = 32
+"""Most steps done in one update, fields left alone for longer have mostly faded anyway."""
+EPSILON = 1 / 256
+"""Values below this are cleared, which keeps the active area of a field small."""
+MARGIN = 16
+"""Cells reserved around the area a field needs, so that its layer is not resized on every update."""
+STRIP_SIZE = 32768
+"""Cells stepped at once, few enough that the arrays of a strip stay in the CPU cache between passes."""
+
+
+@attrs.define(frozen=True)
+class FieldKind:
+    name: str
+    spread: float
+    """Fraction of a cells value which moves to its neighbors each step, from 0 to 1.
+
+    This is scaled by the conductance of the tile, so fields spread slower and linger on tiles which are slow to walk.
+    """
+    decay: float
+    """Fraction of the value kept each step, from 0 to 1."""
+
+    def __attrs_post_init__(self) -> None:
+        if not (0 <= self.spread <= 1 and 0 <= self.decay <= 1):
+            raise ValueError(f"Spread and decay must be from 0 to 1: {self!r}")
+
+
+SCENT = FieldKind("scent", spread=0.2, decay=0.97)
+"""Lingers and spreads slowly."""
+SOUND = FieldKind("sound", spread=0.9, decay=0.6)
+"""Spreads quickly and is soon gone."""
+FIELDS = (SCENT, SOUND)
+
+PLAYER_SCENT = 1.0
+"""Scent left by the player each turn."""
+FOOTSTEP_SOUND = 0.5
+"""Sound made by moving actors."""
+
+_Strip = tuple[NDArray[Any], ...]
+
+
+class FieldLayer:
+    """The values of one field over an area of a map, the field is zero outside of this area.
+
+    Each step is `values = (values * (1 - share) + neighbor_shares) * decay` on walkable tiles and 0 on walls,
+    where `share` is the fraction of a cells value given to its 4 neighbors, `spread` scaled by the tile conductance.
+    Steps are done on flat arrays padded with a border of zeros, since flat slices are much faster than 2D slices,
+    in strips of `STRIP_SIZE` cells with their views and per cell multipliers prepared once.
+
+    >>> layer = FieldLayer(0, 0, 3, 3)
+    >>> layer.values[2, 2] = 1  # The center of the area.
+    >>> layer.bounds = (1, 1, 2, 2)
+    >>> conductance = np.ones((3, 3), np.float32)
+    >>> walkable = np.ones((3, 3), np.bool_)
+    >>> walkable[0, 1] = conductance[0, 1] = 0  # A wall.
+    >>> layer.prepare(FieldKind("test", spread=0.4, decay=1.0), conductance, walkable)
+    >>> layer.step()
+    >>> layer.values[1:-1, 1:-1].astype(float).round(2).tolist(), layer.bounds
+    ([[0.0, 0.0, 0.0], [0.1, 0.6, 0.1], [0.0, 0.1, 0.0]], (1, 0, 3, 3))
+    """
+
+    def __init__(self, top: int, left: int, height: int, width: int) -> None:
+        self.top, self.left, self.height, self.width = top, left, height, width
+        self.values = np.zeros((height + 2, width + 2), np.float32)
+        """The values of the area with a border of zeros, `values[1, 1]` is the value at (left, top)."""
+        self.bounds: tuple[int, int, int, int] | None = None
+        """The (top, left, bottom, right) map area which may be non-zero, None if the field is all zero."""
+        self._back = np.zeros_like(self.values)
+        """The buffer which steps are written to, swapped with `values` after each step."""
+        self._strips: tuple[list[_Strip], list[_Strip]] | None = None
+        """Prepared strips for stepping from `values` to `_back` and back, None until the tiles are known."""
+        self._row_flags = np.zeros(height + 2, np.bool_)
+        self._column_flags = np.zeros(width + 2, np.bool_)
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"top": self.top, "left": self.left, "values": self.values, "bounds": self.bounds}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        height, width = state["values"].shape
+        self.__init__(state["top"], state["left"], height - 2, width - 2)  # type: ignore[misc]
+        self.values[:] = state["values"]
+        self.bounds = state["bounds"]
+
+    def covers(self, top: int, left: int, bottom: int, right: int) -> bool:
+        """Return True if the map area of (top, left, bottom, right) is within this layer."""
+        return (
+            self.top <= top
+            and self.left <= left
+            and bottom <= self.top + self.height
+            and right <= self.left + self.width
+        )
+
+    def get(self, pos: Position) -> float:
+        """Return the value at a map position, 0 if it is outside of this layer."""
+        y, x = pos.y - self.top, pos.x - self.left
+        if 0 <= y < self.height and 0 <= x < self.width:
+            return float(self.values[y + 1, x + 1])
+        return 0.0
+
+    def raise_to(self, pos: Position, strength: float) -> None:
+        """Raise the value at `pos` to at least `strength`, `pos` must be covered by this layer."""
+        index = pos.y - self.top + 1, pos.x - self.left + 1
+        self.values[index] = max(self.values[index], strength)
+        top, left, bottom, right = self.bounds or (pos.y, pos.x, pos.y + 1, pos.x + 1)
+        self.bounds = min(top, pos.y), min(left, pos.x), max(bottom, pos.y + 1), max(right, pos.x + 1)
+
+    def resized(self, top: int, left: int, bottom: int, right: int) -> FieldLayer:
+        """Return a copy of this layer covering a new map area, which must cover `bounds`."""
+        layer = FieldLayer(top, left, bottom - top, right - left)
+        if self.bounds is not None:
+            b_top, b_left, b_bottom, b_right = self.bounds
+            layer.values[b_top - top + 1 : b_bottom - top + 1, b_left - left + 1 : b_right - left + 1] = self.values[
+                b_top - self.top + 1 : b_bottom - self.top + 1, b_left - self.left + 1 : b_right - self.left + 1
+            ]
+        layer.bounds = self.bounds
+        return layer
+
+    def invalidate(self) -> None:
+        """Drop the prepared strips, after the tiles of the area were changed."""
+        self._strips = None
+
+    @property
+    def is_prepared(self) -> bool:
+        return self._strips is not None
+
+    def prepare(self, kind: FieldKind, conductance: NDArray[np.float32], walkable: NDArray[np.bool_]) -> None:
+        """Prepare the strips for stepping `kind`, `conductance` and `walkable` are of the tiles of this area."""
+        stride = self.width + 2
+        share = np.zeros_like(self.values)
+        share[1:-1, 1:-1] = conductance * np.float32(kind.spread)
+        given = (share * np.float32(kind.decay / 4)).ravel()  # Given to each neighbor, including its decay.
+        kept = np.zeros_like(self.values)
+        kept[1:-1, 1:-1] = walkable * np.float32(kind.decay)
+        kept = (kept * (1 - share)).ravel()
+        # Walls and the border give and keep nothing, so what they receive is never passed on and is cleared by the
+        # last step of each update instead of by every step.
+        limit = np.full_like(self.values, np.inf)
+        limit[1:-1, 1:-1][walkable] = EPSILON
+        limit = limit.ravel()
+        rows = max(1, STRIP_SIZE // stride)
+        scratch = np.empty((rows + 2) * stride, np.float32)
+        mask = np.empty(rows * stride, np.bool_)
+        strips: tuple[list[_Strip], list[_Strip]] = ([], [])
+        for source, dest, strip_list in ((self.values, self._back, strips[0]), (self._back, self.values, strips[1])):
+            flat_source, flat_dest = source.ravel(), dest.ravel()
+            for row in range(1, self.height + 1, rows):
+                row_stop = min(self.height + 1, row + rows)
+                start, stop = row * stride, row_stop * stride
+                size = stop - start
+                shares = scratch[: size + 2 * stride]
+                strip_list.append(
+                    (
+                        flat_source[start - stride : stop + stride],
+                        given[start - stride : stop + stride],
+                        shares,
+                        flat_source[start:stop],
+                        kept[start:stop],
+                        flat_dest[start:stop],
+                        shares[:size],  # From above.
+                        shares[2 * stride :],  # From below.
+                        shares[stride - 1 : stride - 1 + size],  # From the left.
+                        shares[stride + 1 : stride + 1 + size],  # From the right.
+                        limit[start:stop],
+                        mask[:size],
+                        mask[:size].reshape(-1, stride),
+                        self._row_flags[row:row_stop],
+                    )
+                )
+        self._strips = strips
+
+    def step(self, steps: int = 1) -> None:
+        """Spread and decay the values by `steps`, then clear values below `EPSILON` and update `bounds`.
+
+        The layer must be prepared, and its area must cover `bounds` grown by `steps`.
+        """
+        assert self._strips is not None, "The layer must be prepared first."
+        multiply, greater_equal, logical_or = np.multiply, np.greater_equal, np.logical_or
+        self._row_flags[:] = False
+        self._column_flags[:] = False
+        for i in range(steps):
+            last = i == steps - 1
+            for (
+                source_halo,
+                given,
+                shares,
+                source,
+                kept,
+                dest,
+                above,
+                below,
+                left,
+                right,
+                limit,
+                mask,
+                mask_2d,
+                row_flags,
+            ) in self._strips[0]:
+                multiply(source_halo, given, out=shares)
+                multiply(source, kept, out=dest)
+                dest += above
+                dest += below
+                dest += left
+                dest += right
+                if last:
+                    greater_equal(dest, limit, out=mask)
+                    dest *= mask
+                    mask_2d.any(axis=1, out=row_flags)
+                    logical_or(self._column_flags, mask_2d.any(axis=0), out=self._column_flags)
+            self.values, self._back = self._back, self.values
+            self._strips = self._strips[1], self._strips[0]
+        rows, columns = self._row_flags.nonzero()[0], self._column_flags.nonzero()[0]
+        if not len(rows):
+            self.bounds = None
+            return
+        self.bounds = (
+            self.top + rows[0] - 1,
+            self.left + columns[0] - 1,
+            self.top + rows[-1],
+            self.left + columns[-1],
+        )
+
+
+@attrs.define
+class MapFields:
+    """The fields of a map."""
+
+    time: int = 0
+    """Scheduler time of the last update."""
+    layers: dict[str, FieldLayer] = attrs.Factory(dict)
+    """Layers by `FieldKind.name`, missing if a field is all zero."""
+
+
+def _get_fields(map_entity: ComponentDict, time: int) -> MapFields:
+    if MapFields not in map_entity:
+        map_entity[MapFields] = MapFields(time=time)
+    return map_entity[MapFields]
+
+
+def _reserve(map: Map, layer: FieldLayer | None, top: int, left: int, bottom: int, right: int) -> FieldLayer:
+    """Return `layer` if it covers the area and is not much larger than needed, otherwise a resized copy of it.
+
+    Resized layers get a `MARGIN` around the area so that a slowly moving field does not resize every turn.
+    """
+    top, left, bottom, right = max(0, top), max(0, left), min(map.height, bottom), min(map.width, right)
+    if (
+        layer is not None
+        and layer.covers(top, left, bottom, right)
+        and layer.height * layer.width <= 4 * (bottom - top + 2 * MARGIN) * (right - left + 2 * MARGIN)
+    ):
+        return layer
+    top, left = max(0, top - MARGIN), max(0, left - MARGIN)
+    bottom, right = min(map.height, bottom + MARGIN), min(map.width, right + MARGIN)
+    if layer is None:
+        return FieldLayer(top, left, bottom - top, right - left)
+    return layer.resized(top, left, bottom, right)
+
+
+def emit(world: ComponentDict, kind: FieldKind, pos: Position, strength: float) -> None:
+    """Raise a field of the active map to at least `strength` at `pos`."""
+    map_entity = world[Context].active_map
+    fields = _get_fields(map_entity, world[Context].sched.time)
+    layer = fields.layers.get(kind.name)
+    if layer is None or not layer.covers(pos.y, pos.x, pos.y + 1, pos.x + 1):
+        top, left, bottom, right = pos.y, pos.x, pos.y + 1, pos.x + 1
+        if layer is not None and layer.bounds is not None:
+            b_top, b_left, b_bottom, b_right = layer.bounds
+            top, left, bottom, right = min(top, b_top), min(left, b_left), max(bottom, b_bottom), max(right, b_right)
+        layer = fields.layers[kind.name] = _reserve(map_entity[Map], layer, top, left, bottom, right)
+    layer.raise_to(pos, strength)
+
+
+def get_value(map_entity: ComponentDict, kind: FieldKind, pos: Position) -> float:
+    """Return the value of a field at `pos`, 0 if the field was never used on this map."""
+    fields = map_entity.get(MapFields)
+    layer = fields.layers.get(kind.name) if fields is not None else None
+    return layer.get(pos) if layer is not None else 0.0
+
+
+def get_gradient(map_entity: ComponentDict, kind: FieldKind, pos: Position) -> Direction | None:
+    """Return the direction of the strongest neighbor of `pos` if it is stronger than `pos`, for following a field."""
+    fields = map_entity.get(MapFields)
+    layer = fields.layers.get(kind.name) if fields is not None else None
+    if layer is None:
+        return None
+    best, best_value = None, layer.get(pos)
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            value = layer.get(Position(pos.x + dx, pos.y + dy))
+            if value > best_value:
+                best, best_value = Direction(dx, dy), value
+    return best
+
+
+def invalidate(map_entity: ComponentDict, x: int, y: int, width: int = 1, height: int = 1) -> None:
+    """Drop the prepared steps of fields overlapping an area of a map, after the tiles of that area were changed."""
+    fields = map_entity.get(MapFields)
+    if fields is None:
+        return
+    for layer in fields.layers.values():
+        if (
+            layer.top < y + height
+            and y < layer.top + layer.height
+            and layer.left < x + width
+            and x < layer.left + layer.width
+        ):
+            layer.invalidate()
+
+
+def _update_field(map: Map, tile_db: TileDB, fields: MapFields, kind: FieldKind, steps: int) -> None:
+    layer = fields.layers.get(kind.name)
+    if layer is None:
+        return
+    if layer.bounds is None:
+        del fields.layers[kind.name]
+        return
+    top, left, bottom, right = layer.bounds
+    layer = fields.layers[kind.name] = _reserve(
+        map, layer, max(0, top - steps), max(0, left - steps), bottom + steps, right + steps
+    )
+    if not layer.is_prepared:
+        tiles = map[a_tiles][layer.top : layer.top + layer.height, layer.left : layer.left + layer.width]
+        layer.prepare(kind, tile_db.conductance[tiles], tile_db.walkable[tiles])
+    layer.step(steps)
+    if layer.bounds is None:
+        del fields.layers[kind.name]
+
+
+@game.profiling.timed("fields")
+def update(world: ComponentDict) -> None:
+    """Advance the fields of the active map by the turns passed since they were last updated."""
+    ctx = world[Context]
+    fields = _get_fields(ctx.active_map, ctx.sched.time)
+    turns = (ctx.sched.time - fields.time) // TURN_TIME
+    if turns <= 0:
+        return
+    fields.time = fields.time + turns * TURN_TIME if turns <= MAX_STEPS else ctx.sched.time
+    steps = min(turns, MAX_STEPS)
+    map = ctx.active_map[Map]
+    tile_db = world[TileDB]
+    for kind in FIELDS:
+        _update_field(map, tile_db, fields, kind, steps)
+    emit(world, SCENT, ctx.player[Position], PLAYER_SCENT)
@@ -1,6 +1,7 @@
 import enum
+import heapq
 from collections import defaultdict
-from typing import Any, Callable, Dict, Iterable, List, Optional, Self, Tuple, Type, TypeVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Self, Sequence, Tuple, Type, TypeVar
 
 import attrs
 import tcod.event
@@ -21,6 +22,9 @@
 
 _MOD_DECODE = {v: k for k, v in _MOD_ENCODE.items()}
 
+_KMOD_SHIFT = int(tcod.event.KMOD_SHIFT)
+_KMOD_CAPS = int(tcod.event.KMOD_CAPS)
+
 
 @attrs.define(frozen=True, kw_only=True)
 class Bind:
@@ -101,6 +105,28 @@ def match(self, event: tcod.event.Event, toggle_shift: bool) -> bool:
             and self.__match_modifier("gui", event)
         )
 
+    def _modifier_masks(self) -> Tuple[Tuple[int, bool], ...]:
+        """Return `(mask, expected)` pairs where `bool(event.mod & mask)` must equal `expected` to match.
+
+        A boolean `shift` is not included since it depends on the toggle shift setting.
+        """
+        masks: List[Tuple[int, bool]] = []
+        for name, value in (("shift", self.shift), ("alt", self.alt), ("ctrl", self.ctrl), ("gui", self.gui)):
+            if isinstance(value, tuple):
+                masks.append((int(getattr(tcod.event, f"KMOD_L{name.upper()}")), value[0]))
+                masks.append((int(getattr(tcod.event, f"KMOD_R{name.upper()}")), value[1]))
+            elif isinstance(value, bool) and name != "shift":
+                masks.append((int(getattr(tcod.event, f"KMOD_{name.upper()}")), value))
+        for mask, value in (
+            (tcod.event.KMOD_MODE, self.mode),
+            (tcod.event.KMOD_NUM, self.num_lock),
+            (tcod.event.KMOD_CAPS, self.caps_lock),
+            (tcod.event.KMOD_SCROLL, self.scroll_lock),
+        ):
+            if value is not None:
+                masks.append((int(mask), value))
+        return tuple(masks)
+
     @classmethod
     def _from_toml_str(cls, state: Dict[str, str]) -> Self:
         """Parse a TOML inline table and return a new Bind."""
@@ -145,15 +171,88 @@ def _as_toml_str(self) -> str:
         return f"""{{ {", ".join(output)} }}"""
 
 
+@attrs.define(frozen=True)
+class _CompiledBind:
+    """A Bind prepared for fast matching."""
+
+    priority: Tuple[int, int]
+    """Sort key, more specific binds come first and then binds which were added first."""
+    value: enum.Enum
+    scancode: Optional[tcod.event.Scancode]
+    """Scancode to check, only set if the sym was already used to look up this bind."""
+    shift: Optional[bool]
+    masks: Tuple[Tuple[int, bool], ...]
+
+    def match(self, event: tcod.event.KeyboardEvent, toggle_shift: bool) -> bool:
+        if self.scancode is not None and self.scancode != event.scancode:
+            return False
+        mod = int(event.mod)  # Plain int operations are much faster than IntFlag operations.
+        if self.shift is not None:
+            shift = mod & _KMOD_SHIFT != 0
+            shift ^= toggle_shift and (mod & _KMOD_CAPS != 0)
+            if self.shift != shift:
+                return False
+        for mask, expected in self.masks:
+            if bool(mod & mask) != expected:
+                return False
+        return True
+
+
+@attrs.define()
+class _BindIndex:
+    """Binds of one enum type bucketed by their key."""
+
+    by_sym: Dict[tcod.event.KeySym, List[_CompiledBind]] = attrs.Factory(dict)
+    """Binds with a sym, each bucket also includes `unkeyed`."""
+    by_scancode: Dict[tcod.event.Scancode, List[_CompiledBind]] = attrs.Factory(dict)
+    """Binds with a scancode but no sym."""
+    unkeyed: List[_CompiledBind] = attrs.Factory(list)
+    """Binds which match any key."""
+
+    @classmethod
+    def build(cls, binds: Dict[Bind, enum.Enum]) -> Self:
+        index = cls()
+        for i, (bind, value) in enumerate(binds.items()):
+            compiled = _CompiledBind(
+                priority=(-bind.value, i),
+                value=value,
+                scancode=bind.scancode if bind.sym is not None else None,
+                shift=bind.shift if isinstance(bind.shift, bool) else None,
+                masks=bind._modifier_masks(),
+            )
+            if bind.sym is not None:
+                index.by_sym.setdefault(bind.sym, []).append(compiled)
+            elif bind.scancode is not None:
+                index.by_scancode.setdefault(bind.scancode, []).append(compiled)
+            else:
+                index.unkeyed.append(compiled)
+        for bucket in index.by_sym.values():
+            bucket += index.unkeyed
+        for bucket in (*index.by_sym.values(), *index.by_scancode.values(), index.unkeyed):
+            bucket.sort(key=lambda x: x.priority)
+        return index
+
+    def candidates(self, event: tcod.event.KeyboardEvent) -> Iterable[_CompiledBind]:
+        """Return the binds which could match `event`, in priority order."""
+        sym_bucket: Sequence[_CompiledBind] = self.by_sym.get(event.sym, self.unkeyed)
+        scancode_bucket = self.by_scancode.get(event.scancode)
+        if scancode_bucket is None:
+            return sym_bucket
+        return heapq.merge(sym_bucket, scancode_bucket, key=lambda x: x.priority)
+
+
 class Keybindings:
     def __init__(self) -> None:
         self.binds: Dict[Type[enum.Enum], Dict[Bind, enum.Enum]] = defaultdict(dict)
         self.enums: Dict[str, Type[enum.Enum]] = {}
         self.toggle_shift = False
+        self._index: Dict[Type[enum.Enum], _BindIndex] = {}
+        """Compiled binds, an entry is removed whenever the binds of its enum type change."""
 
     def register(self, category: str | None = None) -> Callable[[Type[_Enum]], Type[_Enum]]:
         def func(__enum: Type[_Enum]) -> Type[_Enum]:
             self.binds[__enum] = {}
+            self._index.pop(__enum, None)
             self.enums[__enum.__name__] = __enum
             return __enum
 
@@ -168,6 +267,7 @@ def loads(self, s: str) -> None:
             for name, binds in bindings.items():
                 for bind in binds:
                     self.binds[enum_type][Bind._from_toml_str(bind)] = enum_type[name]
+            self._index.pop(enum_type, None)
 
     def dumps(self) -> str:
         output: List[str] = ['version = "0.0"', ""]
@@ -187,19 +287,23 @@ def dumps(self) -> str:
 
     def add_bind(self, enum: enum.Enum, bind: Bind) -> None:
         self.binds[type(enum)][bind] = enum
+        self._index.pop(type(enum), None)
 
     def add_binds(self, bindings: Dict[enum.Enum, Iterable[Bind]]) -> None:
         for value, binds in bindings.items():
             enum_type = type(value)
             for bind in binds:
                 self.binds[enum_type][bind] = value
+            self._index.pop(enum_type, None)
 
     def parse(self, event: tcod.event.Event, enum: Type[_Enum]) -> Optional[_Enum]:
         if not isinstance(event, tcod.event.KeyboardEvent):
             return None
-        binds = self.binds[enum]
-        for bind, value in sorted(binds.items(), key=lambda x: x[0].value, reverse=True):
+        index = self._index.get(enum)
+        if index is None:
+            index = self._index[enum] = _BindIndex.build(self.binds[enum])
+        for bind in index.candidates(event):
             if bind.match(event, self.toggle_shift):
-                assert isinstance(value, enum)
-                return value
+                assert isinstance(bind.value, enum)
+                return bind.value
         return None
@@ -0,0 +1,92 @@
+"""On-disk cache of generated levels, so that each level is only generated once.
+
+A cached level is keyed by a hash of its `MapKey`, the generator version of that key, the world seed,
+the save format version and the tile table, since any of these changing would change the generated level.
+The least recently used levels are deleted once the cache grows past `MAX_CACHE_BYTES`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import pickle
+from pathlib import Path
+
+from tcod.ec import ComponentDict
+
+import game.paths
+import game.save
+from game.components import Seed
+from game.map import MapKey
+from game.tiles import TileDB
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_NAME = "levels"
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+"""Total size of cached levels which is kept after a level is added."""
+
+_enabled = True
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(enabled: bool) -> None:
+    """Enable or disable reading and writing cached levels."""
+    global _enabled
+    _enabled = enabled
+
+
+def get_cache_key(world: ComponentDict, key: MapKey) -> str:
+    """Return the hash identifying the level generated for `key` in `world`."""
+    digest = hashlib.sha256(f"{key!r}|{key.generator_version}|{world[Seed].value}|{game.save.VERSION}|".encode())
+    digest.update(world[TileDB].data.tobytes())
+    return digest.hexdigest()[:32]
+
+
+def get_cache_path(world: ComponentDict, key: MapKey) -> Path:
+    cache_dir = game.paths.get_cache_dir() / CACHE_DIR_NAME
+    cache_dir.mkdir(exist_ok=True)
+    return cache_dir / f"{get_cache_key(world, key)}.lvl"
+
+
+def evict(directory: Path, max_bytes: int) -> None:
+    """Delete the least recently used levels in `directory` until they take at most `max_bytes`."""
+    entries = [(path.stat(), path) for path in directory.glob("*.lvl")]
+    entries.sort(key=lambda entry: -entry[0].st_mtime)
+    total = 0
+    for stat, path in entries:
+        total += stat.st_size
+        if total > max_bytes:
+            path.unlink(missing_ok=True)
+
+
+def generate(world: ComponentDict, key: MapKey) -> ComponentDict:
+    """Return the level of `key`, loading it from the cache if possible or generating and caching it otherwise."""
+    if not _enabled:
+        return key.generate(world)
+    try:
+        path = get_cache_path(world, key)
+    except OSError:
+        logger.warning("Level cache is unavailable.", exc_info=True)
+        return key.generate(world)
+
+    if path.exists():
+        try:
+            map_entity = game.save.load_map(path)
+            os.utime(path)  # Mark as recently used.
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            logger.warning("Could not read cached level %s", path, exc_info=True)
+        else:
+            return map_entity
+
+    map_entity = key.generate(world)
+    try:
+        game.save.save_map(map_entity, path)
+        evict(path.parent, MAX_CACHE_BYTES)
+    except OSError:
+        logger.warning("Could not write cached level %s", path, exc_info=True)
+    return map_entity
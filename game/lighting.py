@@ -0,0 +1,155 @@
+"""Light layers of maps, combining the ambient light of a map with the light of `Light` sources.
+
+Each source contributes a patch, its light within its radius limited by FOV, which is cached until the source moves
+or a tile within its radius changes.  Patches are added into one light layer per map as they change,
+so rendering only reads the layer and does no work per light.
+
+Lights on map features are static, they are only found once and never checked for movement.
+Lights on actors are dynamic, their positions are checked once per turn by `update`.
+Only maps with `AmbientLight` have a light layer, other maps are fully lit.
+"""
+
+from __future__ import annotations
+
+import attrs
+import numpy as np
+from numpy.typing import NDArray
+from tcod.ec import ComponentDict
+
+import game.actor_tools
+import game.profiling
+from game.components import AmbientLight, Context, Light, MapFeatures, Position
+from game.map import Map
+
+
+@attrs.define
+class LightPatch:
+    """The light added by one source."""
+
+    pos: Position
+    """The position of the source when this was computed."""
+    origin: Position
+    """The map position of the top-left corner of `light`."""
+    light: NDArray[np.float32]
+    """The (height, width, rgb) light added around the source, from 0 to 1."""
+
+    def get_slices(self) -> tuple[slice, slice]:
+        return np.s_[
+            self.origin.y : self.origin.y + self.light.shape[0], self.origin.x : self.origin.x + self.light.shape[1]
+        ]
+
+    def intersects(self, x: int, y: int, width: int, height: int) -> bool:
+        """Return True if this patch overlaps the area at (x, y) of `width` and `height`.
+
+        >>> patch = LightPatch(Position(2, 2), Position(0, 0), np.zeros((5, 5, 3), np.float32))
+        >>> patch.intersects(4, 4, 10, 10), patch.intersects(5, 0, 10, 10)
+        (True, False)
+        """
+        return (
+            x < self.origin.x + self.light.shape[1]
+            and self.origin.x < x + width
+            and y < self.origin.y + self.light.shape[0]
+            and self.origin.y < y + height
+        )
+
+
+class MapLights:
+    """The light layer of a map and the patches it was built from.
+
+    This is stored as a component of a map entity and is not saved, it's rebuilt from the light sources when needed.
+    """
+
+    def __init__(self, ambient: AmbientLight, shape: tuple[int, int]) -> None:
+        self.ambient = ambient
+        self.layer: NDArray[np.float32] = np.empty((*shape, 3), np.float32)
+        """The total light of each cell, values above 1 are clipped when used."""
+        self.layer[:] = np.array(ambient.color, np.float32) / 255
+        self.patches: dict[ComponentDict, LightPatch] = {}
+        """Patches by source entity."""
+        self.static_found = False
+        """True once the static lights of the map have been found."""
+        self.dirty = True
+        """True if any patches must be computed before the layer is used."""
+
+    def add(self, source: ComponentDict, patch: LightPatch) -> None:
+        self.layer[patch.get_slices()] += patch.light
+        self.patches[source] = patch
+
+    def remove(self, source: ComponentDict) -> None:
+        patch = self.patches.pop(source)
+        self.layer[patch.get_slices()] -= patch.light
+
+
+def compute_patch(world: ComponentDict, map_entity: ComponentDict, pos: Position, light: Light) -> LightPatch:
+    """Return the light cast by `light` at `pos`, fading out towards its radius."""
+    visible, origin = game.actor_tools.get_fov_window(world, map_entity, pos, light.radius)
+    y, x = np.ogrid[
+        origin.y - pos.y : origin.y - pos.y + visible.shape[0], origin.x - pos.x : origin.x - pos.x + visible.shape[1]
+    ]
+    brightness = np.clip(1 - np.sqrt(y**2 + x**2) / (light.radius + 1), 0, 1) * visible
+    color = np.array(light.color, np.float32) / 255
+    return LightPatch(pos, origin, (brightness[:, :, np.newaxis] * color).astype(np.float32))
+
+
+def _get_dynamic_sources(world: ComponentDict) -> list[ComponentDict]:
+    return [actor for actor in world[Context].actors if Light in actor]
+
+
+@game.profiling.timed("lighting")
+def update(world: ComponentDict) -> None:
+    """Bring the light layer of the active map up to date with its light sources."""
+    map_entity = world[Context].active_map
+    ambient = map_entity.get(AmbientLight)
+    if ambient is None:
+        return
+    lights = map_entity.get(MapLights)
+    if lights is None or lights.ambient != ambient:
+        lights = map_entity[MapLights] = MapLights(ambient, (map_entity[Map].height, map_entity[Map].width))
+
+    if not lights.static_found:
+        for feature in map_entity[MapFeatures].features:
+            if Light in feature and feature not in lights.patches:
+                lights.add(feature, compute_patch(world, map_entity, feature[Position], feature[Light]))
+        lights.static_found = True
+
+    dynamic = _get_dynamic_sources(world)
+    for actor in dynamic:
+        patch = lights.patches.get(actor)
+        if patch is not None and patch.pos == actor[Position]:
+            continue
+        if patch is not None:
+            lights.remove(actor)
+        lights.add(actor, compute_patch(world, map_entity, actor[Position], actor[Light]))
+    features = map_entity[MapFeatures].features
+    for source in lights.patches.keys() - {*dynamic, *features}:
+        lights.remove(source)
+    lights.dirty = False
+
+
+def get_light(world: ComponentDict) -> NDArray[np.float32] | None:
+    """Return the light layer of the active map, or None if the map is fully lit."""
+    map_entity = world[Context].active_map
+    if AmbientLight not in map_entity:
+        return None
+    lights = map_entity.get(MapLights)
+    if lights is None or lights.dirty:
+        update(world)
+        lights = map_entity[MapLights]
+    return lights.layer
+
+
+def invalidate(map_entity: ComponentDict, pos: Position) -> None:
+    """Drop the patches of sources which may light `pos`, after the tile at `pos` was changed."""
+    invalidate_area(map_entity, pos.x, pos.y, 1, 1)
+
+
+def invalidate_area(map_entity: ComponentDict, x: int, y: int, width: int, height: int) -> None:
+    """Drop the patches of sources which may light an area, after the tiles of that area were changed."""
+    lights = map_entity.get(MapLights)
+    if lights is None:
+        return
+    for source, patch in list(lights.patches.items()):
+        if patch.intersects(x, y, width, height):
+            lights.remove(source)
+            lights.dirty = True
+            lights.static_found = False
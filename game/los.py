@@ -0,0 +1,118 @@
+"""Batched line of sight checks between many pairs of positions on a map.
+
+`check_lines` walks Bresenham lines for all pairs at once as arrays, matching `tcod.los.bresenham`.
+`check_visible` answers many targets of one source from a single FOV window instead.
+Both only read the transparency of the cells they need from `TileDB.transparent`, so nothing needs to be invalidated.
+"""
+
+from __future__ import annotations
+
+import attrs
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+from tcod.ec import ComponentDict
+
+import game.actor_tools
+import game.profiling
+from game.components import Position
+from game.map import Map
+from game.map_attrs import a_tiles
+from game.tiles import TileDB
+
+NO_BLOCKER = -1
+"""The blocker coordinates of lines which are clear."""
+
+
+@attrs.define
+class LineResults:
+    clear: NDArray[np.bool_]
+    """True for each pair which can see each other."""
+    blocker: NDArray[np.intp]
+    """The (x, y) of the first opaque cell of each line, `NO_BLOCKER` for clear lines."""
+
+    def __len__(self) -> int:
+        return len(self.clear)
+
+
+def get_lines(sources: NDArray[np.intp], targets: NDArray[np.intp]) -> tuple[NDArray[np.intp], NDArray[np.bool_]]:
+    """Return the points of the lines between pairs of (x, y) positions and a mask of which points are on each line.
+
+    Points are returned as an array of shape (pairs, longest_line, 2), lines shorter than the longest are padded with their target.
+    Each line includes both of its endpoints.
+
+    >>> points, mask = get_lines(np.array([[0, 0], [5, 5]]), np.array([[3, 1], [5, 4]]))
+    >>> points[0].tolist()
+    [[0, 0], [1, 0], [2, 1], [3, 1]]
+    >>> points[1][mask[1]].tolist()
+    [[5, 5], [5, 4]]
+    """
+    delta = targets - sources
+    lengths = np.abs(delta).max(axis=1)
+    steps = np.arange(lengths.max(initial=0) + 1)
+    mask: NDArray[np.bool_] = steps[np.newaxis, :] <= lengths[:, np.newaxis]
+    line_steps = np.minimum(steps[np.newaxis, :], lengths[:, np.newaxis])[:, :, np.newaxis]
+    divisor = np.maximum(lengths, 1)[:, np.newaxis, np.newaxis] * 2
+    # Rounds halfway cases towards the source, the same as tcod.los.bresenham.
+    offsets = (2 * np.abs(delta)[:, np.newaxis, :] * line_steps + divisor // 2 - 1) // divisor
+    points: NDArray[np.intp] = sources[:, np.newaxis, :] + np.sign(delta)[:, np.newaxis, :] * offsets
+    return points, mask
+
+
+def _as_positions(positions: ArrayLike | list[Position]) -> NDArray[np.intp]:
+    if isinstance(positions, list) and positions and isinstance(positions[0], Position):
+        positions = [pos.xy for pos in positions]
+    array: NDArray[np.intp] = np.asarray(positions, dtype=np.intp).reshape(-1, 2)
+    return array
+
+
+def _check_bounds(map: Map, positions: NDArray[np.intp]) -> None:
+    x, y = positions[:, 0], positions[:, 1]
+    if not ((0 <= x) & (x < map.width) & (0 <= y) & (y < map.height)).all():
+        raise ValueError("Positions must be within the bounds of the map.")
+
+
+@game.profiling.timed("check_lines")
+def check_lines(
+    world: ComponentDict,
+    map_entity: ComponentDict,
+    sources: ArrayLike | list[Position],
+    targets: ArrayLike | list[Position],
+) -> LineResults:
+    """Check the lines of sight between pairs of sources and targets on a map.
+
+    Positions are sequences of `Position` or arrays of (x, y) of the same length.
+    A line is blocked by any opaque cell between its ends.
+    The ends themselves may be opaque, so that a wall can be seen.
+    """
+    map = map_entity[Map]
+    source_array, target_array = _as_positions(sources), _as_positions(targets)
+    if source_array.shape != target_array.shape:
+        raise ValueError(f"Sources and targets must have the same length: {len(source_array)} != {len(target_array)}")
+    _check_bounds(map, source_array)
+    _check_bounds(map, target_array)
+    points, mask = get_lines(source_array, target_array)
+    mask[:, 0] = False  # The source.
+    mask[np.arange(len(mask)), np.abs(target_array - source_array).max(axis=1)] = False  # The target.
+    opaque = ~world[TileDB].transparent[map[a_tiles][points[..., 1], points[..., 0]]] & mask
+    clear = ~opaque.any(axis=1)
+    blocker = np.full_like(source_array, NO_BLOCKER)
+    blocked = ~clear
+    blocker[blocked] = points[blocked, opaque[blocked].argmax(axis=1)]
+    return LineResults(clear, blocker)
+
+
+def check_visible(
+    world: ComponentDict, map_entity: ComponentDict, source: Position, targets: ArrayLike | list[Position], radius: int
+) -> NDArray[np.bool_]:
+    """Return which targets are visible from `source` within `radius`, using one FOV computation for all of them.
+
+    This follows the same rules as actor FOV, which may differ from `check_lines` for a few cells near corners.
+    """
+    visible, origin = game.actor_tools.get_fov_window(world, map_entity, source, radius)
+    target_array = _as_positions(targets)
+    i = target_array[:, 1] - origin.y
+    j = target_array[:, 0] - origin.x
+    inside = (0 <= i) & (i < visible.shape[0]) & (0 <= j) & (j < visible.shape[1])
+    result = np.zeros(len(target_array), dtype=np.bool_)
+    result[inside] = visible[i[inside], j[inside]]
+    return result
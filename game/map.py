@@ -1,4 +1,4 @@
-from typing import Any, Dict, Hashable, Optional, TypeVar
+from typing import Any, ClassVar, Dict, Hashable, Iterator, Optional, TypeVar
 
 import attrs
 import numpy as np
@@ -59,8 +59,15 @@ def __setitem__(self, attr: MapAttribute, array: NDArray[Any]) -> None:
     def __delitem__(self, attr: MapAttribute) -> None:
         del self._data[attr.key]
 
+    def items(self) -> Iterator[tuple[Hashable, NDArray[Any]]]:
+        """Iterate over the key and array of each allocated attribute."""
+        return iter(self._data.items())
+
 
 @attrs.define(frozen=True)
 class MapKey:
+    generator_version: ClassVar[int] = 1
+    """Increase this when `generate` changes its output, so that levels cached with older versions are not used."""
+
     def generate(self, world: ComponentDict) -> ComponentDict:
         raise NotImplementedError()
@@ -1,12 +1,22 @@
 import itertools
-import random
+import zlib
 
 import attrs
+import numpy as np
+from numpy.typing import NDArray
 from tcod.ec import ComponentDict
 
+import game.connectivity
+import game.dirty_rows
+import game.fields
+import game.level_cache
+import game.lighting
 import game.mapgen.caves
+import game.mipmap
+import game.profiling
 from game import map_attrs
-from game.components import Context, Graphic, MapDict, MapFeatures, MapInfo, Position, Stairway
+from game.actor_types import ActiveFOV, Memory
+from game.components import Context, Graphic, MapDict, MapFeatures, MapInfo, Position, Seed, Stairway
 from game.map import Map, MapKey
 from game.tiles import TileDB
 
@@ -18,7 +28,7 @@ class TestMap(MapKey):
     def generate(self, world: ComponentDict) -> ComponentDict:
         map = new_map(world, 50, 50)
         free_spaces = list(itertools.product(range(1, 9), range(1, 9)))
-        random.shuffle(free_spaces)
+        get_rng(world, self).shuffle(free_spaces)
         map[MapFeatures] = MapFeatures(
             [
                 ComponentDict(
@@ -38,6 +48,14 @@ def generate(self, world: ComponentDict) -> ComponentDict:
         return map
 
 
+def get_rng(world: ComponentDict, key: MapKey) -> np.random.Generator:
+    """Return a new random generator for generating the map at `key`.
+
+    The result only depends on the world seed and `key`, so levels are the same no matter which order they're made in.
+    """
+    return np.random.default_rng([world[Seed].value, zlib.crc32(repr(key).encode())])
+
+
 def new_map(world: ComponentDict, width: int, height: int) -> ComponentDict:
     tile_db = world[TileDB]
     map = Map(width, height)
@@ -52,9 +70,60 @@ def new_map(world: ComponentDict, width: int, height: int) -> ComponentDict:
 def get_map(world: ComponentDict, key: MapKey) -> ComponentDict:
     map_dict = world[MapDict]
     if key not in map_dict:
-        map_dict[key] = key.generate(world)
+        with game.profiling.section("generate"):
+            map_dict[key] = game.level_cache.generate(world, key)
     return map_dict[key]
 
 
 def activate_map(world: ComponentDict, key: MapKey) -> None:
     world[Context].active_map = get_map(world, key)
+
+
+def set_tile(world: ComponentDict, map_entity: ComponentDict, pos: Position, tile_id: int) -> None:
+    """Change a tile of a map after it was generated.
+
+    Actors which remember the old tile keep remembering it until they see the new one.
+    """
+    tiles = map_entity[Map][map_attrs.a_tiles]
+    old_tile = int(tiles[pos.yx])
+    if old_tile == tile_id:
+        return
+    for actor in world[Context].actors:
+        memory = actor.get(Memory)
+        layer = memory.layers.get(map_entity) if memory is not None else None
+        if layer is not None and layer.is_seen(pos):
+            layer.overrides.setdefault(pos, old_tile)
+        fov = actor.get(ActiveFOV)
+        if fov is not None and fov.active_map is map_entity:
+            del actor[ActiveFOV]  # Transparency may have changed.
+    tiles[pos.yx] = tile_id
+    game.dirty_rows.mark(tiles, pos.y, pos.y + 1)
+    game.mipmap.invalidate(map_entity, pos.x, pos.y)
+    game.connectivity.update_tile(world, map_entity, pos)
+    game.lighting.invalidate(map_entity, pos)
+    game.fields.invalidate(map_entity, pos.x, pos.y)
+
+
+def set_tiles(world: ComponentDict, map_entity: ComponentDict, x: int, y: int, tiles: NDArray[np.uint8]) -> None:
+    """Change an area of a map with its top-left corner at (x, y), as `set_tile` does for each tile."""
+    height, width = tiles.shape
+    area = np.s_[y : y + height, x : x + width]
+    old_tiles = map_entity[Map][map_attrs.a_tiles][area]
+    changed = old_tiles != tiles
+    if not changed.any():
+        return
+    for actor in world[Context].actors:
+        memory = actor.get(Memory)
+        layer = memory.layers.get(map_entity) if memory is not None else None
+        if layer is not None:
+            for j, i in np.argwhere(changed & layer.get_seen(area)).tolist():
+                layer.overrides.setdefault(Position(x + i, y + j), int(old_tiles[j, i]))
+        fov = actor.get(ActiveFOV)
+        if fov is not None and fov.active_map is map_entity:
+            del actor[ActiveFOV]
+    old_tiles[...] = tiles
+    game.dirty_rows.mark(map_entity[Map][map_attrs.a_tiles], y, y + height)
+    game.mipmap.invalidate(map_entity, x, y, width, height)
+    game.connectivity.invalidate(map_entity)
+    game.lighting.invalidate_area(map_entity, x, y, width, height)
+    game.fields.invalidate(map_entity, x, y, width, height)
@@ -2,20 +2,20 @@
 
 import attrs
 import numpy as np
-import scipy.ndimage  # type: ignore
-import scipy.signal  # type: ignore
 from numpy.typing import NDArray
 from tcod.ec import ComponentDict
 
 import game.map_tools
 from game import map_attrs
-from game.components import Graphic, MapFeatures, Position, Stairway
+from game.components import AmbientLight, Graphic, Light, MapFeatures, Position, Stairway
 from game.map import Map, MapKey
 from game.tiles import TileDB
 
 
 def get_holes(input: NDArray[Any]) -> NDArray[np.bool_]:
     """Return a boolean map for all sections which are holes"""
+    import scipy.ndimage  # type: ignore  # SciPy is slow to import, so it's only loaded once a cave is generated.
+
     label, num_features = scipy.ndimage.label(input, [[0, 1, 0], [1, 1, 1], [0, 1, 0]])
     max_label = np.argmax([np.sum(label == i) for i in range(1, num_features + 1)]) + 1
     label[label == max_label] = 0
@@ -24,14 +24,20 @@ def get_holes(input: NDArray[Any]) -> NDArray[np.bool_]:
 
 @attrs.define(frozen=True)
 class CaveMap(MapKey):
+    generator_version = 2
+
     level: int
+    width: int = attrs.field(default=50, kw_only=True)
+    height: int = attrs.field(default=50, kw_only=True)
 
     def generate(self, world: ComponentDict) -> ComponentDict:
         assert self.level > 0
+        import scipy.signal  # type: ignore
+
         tiles_db = world[TileDB]
-        rng = np.random.default_rng()
+        rng = game.map_tools.get_rng(world, self)
 
-        map = game.map_tools.new_map(world, 50, 50)
+        map = game.map_tools.new_map(world, self.width, self.height)
         walls = np.zeros((map[Map].height - 2, map[Map].width - 2), bool)
 
         walls.ravel()[: walls.size * 45 // 100] = 1
@@ -68,7 +74,12 @@ def generate(self, world: ComponentDict) -> ComponentDict:
         map[MapFeatures] = MapFeatures(
             [
                 ComponentDict(
-                    [Position(*free_spaces.pop()), Graphic(ord(">")), Stairway(down=CaveMap(self.level + 1))]
+                    [
+                        Position(*free_spaces.pop()),
+                        Graphic(ord(">")),
+                        Stairway(down=CaveMap(self.level + 1)),
+                        Light(radius=4, color=(96, 128, 255)),
+                    ]
                 ),
                 ComponentDict(
                     [
@@ -79,5 +90,6 @@ def generate(self, world: ComponentDict) -> ComponentDict:
                 ),
             ]
         )
+        map[AmbientLight] = AmbientLight((64, 64, 80))
 
         return map
@@ -1,18 +1,209 @@
+"""The overworld, its terrain is generated from noise in chunks as the camera and player approach it."""
+
+from __future__ import annotations
+
+import concurrent.futures
+import threading
+from typing import Any
+
 import attrs
+import numpy as np
+import tcod.noise
+import tcod.path
+from numpy.typing import NDArray
 from tcod.ec import ComponentDict
 
 import game.map_tools
 from game import map_attrs
+from game.components import Context, MapInfo, Position
 from game.map import Map, MapKey
 from game.tiles import TileDB
 
+WORLD_SIZE = 1024
+"""Width and height of the overworld."""
+CHUNK_SIZE = 32
+"""Width and height of the area generated at once."""
+PLAYER_RADIUS = 1
+"""Chunks within this distance of the player chunk are generated before the player can see or reach them."""
+SPAWN_REGION_SIZE = 1000
+"""Least number of cells which must be reachable from where the player starts."""
+SPAWN_SEARCH_RADIUS = 4
+"""Chunks within this distance of the origin may be generated while looking for where the player starts."""
+MAX_PENDING = 64
+"""Maximum number of chunks queued on the workers at once."""
+TERRAIN = ("water", "sand", "plains", "forest", "mountain")
+"""Tile names used by `generate_chunk`, in the order of its terrain indexes."""
+NOISE_SCALE = 1 / 64
+"""Noise units per tile, larger values make smaller features."""
+
+_executor: concurrent.futures.ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="Chunk")
+        return _executor
+
+
+def generate_chunk(seeds: tuple[int, int], palette: NDArray[np.uint8], i: int, j: int) -> NDArray[np.uint8]:
+    """Return the tiles of chunk (i, j).
+
+    The result only depends on the arguments, so it's safe to call from any thread.
+    """
+    elevation = tcod.noise.Noise(2, implementation=tcod.noise.Implementation.FBM, octaves=5, seed=seeds[0])
+    moisture = tcod.noise.Noise(2, implementation=tcod.noise.Implementation.FBM, octaves=3, seed=seeds[1])
+    ogrid = [
+        np.arange(i * CHUNK_SIZE, (i + 1) * CHUNK_SIZE, dtype=np.float32) * NOISE_SCALE,
+        np.arange(j * CHUNK_SIZE, (j + 1) * CHUNK_SIZE, dtype=np.float32) * NOISE_SCALE,
+    ]
+    height = elevation.sample_ogrid(ogrid)
+    wet = moisture.sample_ogrid(ogrid)
+    terrain = np.select([height < -0.25, height < -0.15, height > 0.5, wet > 0.2], [0, 1, 4, 3], 2)
+    tiles: NDArray[np.uint8] = palette[terrain]
+    return tiles
+
+
+class OverworldChunks:
+    """Tracks which chunks of a map have been generated.  Chunks being generated by workers are not saved."""
+
+    def __init__(self, shape: tuple[int, int], seeds: tuple[int, int]) -> None:
+        self.generated = np.zeros((-(-shape[0] // CHUNK_SIZE), -(-shape[1] // CHUNK_SIZE)), dtype=np.bool_)
+        """Chunk (i, j) indexes which have been written to the map."""
+        self.seeds = seeds
+        """Noise seeds of elevation and moisture."""
+        self.pending: dict[tuple[int, int], concurrent.futures.Future[NDArray[np.uint8]]] = {}
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"generated": self.generated, "seeds": self.seeds}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.pending = {}
+
+
+def _get_palette(world: ComponentDict) -> NDArray[np.uint8]:
+    tile_db = world[TileDB]
+    return np.array([tile_db[name] for name in TERRAIN], dtype=np.uint8)
+
+
+def _commit(world: ComponentDict, map_entity: ComponentDict, i: int, j: int, tiles: NDArray[np.uint8]) -> None:
+    """Write a generated chunk to the map, actors which saw the ungenerated tiles keep remembering them."""
+    map = map_entity[Map]
+    y, x = i * CHUNK_SIZE, j * CHUNK_SIZE
+    height, width = min(CHUNK_SIZE, map.height - y), min(CHUNK_SIZE, map.width - x)
+    game.map_tools.set_tiles(world, map_entity, x, y, tiles[:height, :width])
+    map_entity[OverworldChunks].generated[i, j] = True
+
+
+def _chunks_around(chunks: OverworldChunks, center: Position, radius: int) -> list[tuple[int, int]]:
+    """Return the ungenerated chunks within `radius` chunks of `center`, nearest first."""
+    center_i, center_j = center.y // CHUNK_SIZE, center.x // CHUNK_SIZE
+    i0, i1 = max(0, center_i - radius), min(chunks.generated.shape[0], center_i + radius + 1)
+    j0, j1 = max(0, center_j - radius), min(chunks.generated.shape[1], center_j + radius + 1)
+    if i0 >= i1 or j0 >= j1:
+        return []
+    missing = np.argwhere(~chunks.generated[i0:i1, j0:j1]) + (i0, j0)
+    distance = np.abs(missing - (center_i, center_j)).max(axis=1)
+    return [(i, j) for i, j in missing[np.argsort(distance, kind="stable")].tolist()]
+
+
+def ensure_chunks(world: ComponentDict, map_entity: ComponentDict, center: Position, radius: int) -> None:
+    """Generate the chunks within `radius` of `center` now, waiting on workers which already started them."""
+    chunks = map_entity[OverworldChunks]
+    palette = _get_palette(world)
+    for i, j in _chunks_around(chunks, center, radius):
+        future = chunks.pending.pop((i, j), None)
+        if future is not None and not future.cancel():
+            tiles = future.result()
+        else:
+            tiles = generate_chunk(chunks.seeds, palette, i, j)
+        _commit(world, map_entity, i, j, tiles)
+
+
+def find_spawn(world: ComponentDict, map_entity: ComponentDict) -> Position:
+    """Return the walkable cell nearest to the origin from which at least `SPAWN_REGION_SIZE` cells can be reached.
+
+    Only generated cells count as reachable, more chunks around the origin are generated until a cell is found.
+    The cell reaching the most is returned if none reach enough within `SPAWN_SEARCH_RADIUS`.
+    Regions are flood filled with tcod instead of labeled with `game.connectivity`, so that SciPy is not imported.
+    """
+    tiles = map_entity[Map][map_attrs.a_tiles]
+    walkable_db = world[TileDB].walkable
+    best, best_size = Position(0, 0), 0
+    for radius in range(PLAYER_RADIUS, SPAWN_SEARCH_RADIUS + 1):
+        ensure_chunks(world, map_entity, Position(0, 0), radius)
+        size = (radius + 1) * CHUNK_SIZE
+        cost = walkable_db[tiles[:size, :size]].astype(np.int8)
+        unvisited = cost != 0
+        while unvisited.any():
+            ys, xs = unvisited.nonzero()
+            nearest = int(np.argmin(np.maximum(ys, xs)))
+            start = Position(int(xs[nearest]), int(ys[nearest]))
+            distance = tcod.path.maxarray(cost.shape, dtype=np.int32)
+            distance[start.yx] = 0
+            tcod.path.dijkstra2d(distance, cost, 1, 1, out=distance)
+            reached = distance != np.iinfo(np.int32).max
+            reached_size = int(reached.sum())
+            if reached_size >= SPAWN_REGION_SIZE:
+                return start
+            if reached_size > best_size:
+                best, best_size = start, reached_size
+            unvisited &= ~reached
+    return best
+
+
+def is_streaming(world: ComponentDict) -> bool:
+    """Return True if chunks of the active map are being generated by workers."""
+    chunks = world[Context].active_map.get(OverworldChunks)
+    return chunks is not None and bool(chunks.pending)
+
+
+def stream_chunks(world: ComponentDict, view_shape: tuple[int, int]) -> None:
+    """Update the chunks of the active map for a view of `view_shape` cells.
+
+    Finished chunks are written to the map, chunks around the player are generated immediately,
+    chunks around the camera are queued on workers, and queued chunks which left the view are dropped.
+    Maps without `OverworldChunks` are ignored.
+    """
+    map_entity = world[Context].active_map
+    chunks = map_entity.get(OverworldChunks)
+    if chunks is None:
+        return
+    for (i, j), future in list(chunks.pending.items()):
+        if future.done():
+            del chunks.pending[i, j]
+            _commit(world, map_entity, i, j, future.result())
+
+    ensure_chunks(world, map_entity, world[Context].player[Position], PLAYER_RADIUS)
+
+    map_info = map_entity[MapInfo]
+    radius = max(view_shape) * map_info.zoom // 2 // CHUNK_SIZE + 1
+    wanted = _chunks_around(chunks, map_info.camera_center, radius)
+    wanted_set = set(wanted)
+    for index, future in list(chunks.pending.items()):
+        if index not in wanted_set and future.cancel():
+            del chunks.pending[index]
+    palette = _get_palette(world)
+    for i, j in wanted:
+        if len(chunks.pending) >= MAX_PENDING:
+            break
+        if (i, j) not in chunks.pending:
+            chunks.pending[i, j] = _get_executor().submit(generate_chunk, chunks.seeds, palette, i, j)
+
 
 @attrs.define(frozen=True)
 class WorldMap(MapKey):
     def generate(self, world: ComponentDict) -> ComponentDict:
         tiles_db = world[TileDB]
 
-        map = game.map_tools.new_map(world, 120, 120)
-        map[Map][map_attrs.a_tiles][:] = tiles_db["plains"]
+        map = game.map_tools.new_map(world, WORLD_SIZE, WORLD_SIZE)
+        map[Map][map_attrs.a_tiles][:] = tiles_db["ungenerated"]
+        rng = game.map_tools.get_rng(world, self)
+        elevation_seed, moisture_seed = rng.integers(2**31, size=2).tolist()
+        map[OverworldChunks] = OverworldChunks((WORLD_SIZE, WORLD_SIZE), (elevation_seed, moisture_seed))
+        ensure_chunks(world, map, Position(0, 0), PLAYER_RADIUS)
 
         return map
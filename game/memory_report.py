@@ -0,0 +1,180 @@
+"""Accounting of the memory held by a world, by level, map attribute, actor memory and schedule.
+
+Array sizes are exact, sizes of Python objects are shallow estimates from `sys.getsizeof`.
+"""
+
+from __future__ import annotations
+
+import sys
+from collections import defaultdict, deque
+from typing import Iterable
+
+import attrs
+from tcod.ec import ComponentDict
+
+from game.actor_types import Memory
+from game.components import Context, MapDict, MapFeatures, Player, Position
+from game.connectivity import MapConnectivity
+from game.lighting import MapLights
+from game.map import Map
+from game.mipmap import MapMipmaps
+
+
+@attrs.define(frozen=True)
+class Entry:
+    section: str
+    """The kind of data: "map", "features", "mipmaps", "connectivity", "lighting", "memory", or "schedule"."""
+    owner: str
+    """The level or actor holding the data."""
+    name: str
+    nbytes: int
+    count: int
+    """The number of entities or items, or array cells for map attributes."""
+
+
+@attrs.define(frozen=True)
+class Sample:
+    turn: int
+    levels: int
+    nbytes: int
+
+
+MAX_SAMPLES = 100
+"""Number of past reports kept by `MemoryHistory`, older ones are dropped."""
+
+
+@attrs.define
+class MemoryHistory:
+    """Totals of past reports, stored on the world to show growth over time.
+
+    A sample is only taken when a report is requested, since a report walks the whole world.
+    """
+
+    samples: deque[Sample] = attrs.Factory(lambda: deque(maxlen=MAX_SAMPLES))
+
+
+@attrs.define
+class MemoryReport:
+    entries: list[Entry] = attrs.Factory(list)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(entry.nbytes for entry in self.entries)
+
+    def by_section(self) -> dict[str, int]:
+        """Return the total bytes of each section."""
+        totals: dict[str, int] = defaultdict(int)
+        for entry in self.entries:
+            totals[entry.section] += entry.nbytes
+        return dict(totals)
+
+    def by_owner(self) -> dict[str, int]:
+        """Return the total bytes of each level or actor, largest first."""
+        totals: dict[str, int] = defaultdict(int)
+        for entry in self.entries:
+            totals[entry.owner] += entry.nbytes
+        return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def entity_nbytes(entity: ComponentDict) -> int:
+    """Return a shallow estimate of the memory used by an entity and its components."""
+    return sys.getsizeof(entity) + sum(sys.getsizeof(entity[key]) for key in entity)
+
+
+def _entities_nbytes(entities: Iterable[ComponentDict]) -> tuple[int, int]:
+    nbytes = count = 0
+    for entity in entities:
+        nbytes += entity_nbytes(entity)
+        count += 1
+    return nbytes, count
+
+
+def describe_actor(actor: ComponentDict) -> str:
+    if Player in actor:
+        return "player"
+    pos = actor.get(Position)
+    return f"actor at {pos.x},{pos.y}" if pos is not None else f"actor {id(actor):x}"
+
+
+def take_report(world: ComponentDict) -> MemoryReport:
+    """Walk the world and return the memory held by each part of it."""
+    report = MemoryReport()
+    add = report.entries.append
+    level_names: dict[ComponentDict, str] = {}
+    for key, map_entity in world[MapDict].items():
+        level = level_names[map_entity] = repr(key)
+        map = map_entity[Map]
+        for attr_key, array in map.items():
+            add(Entry("map", level, str(attr_key), array.nbytes, array.size))
+        features = map_entity[MapFeatures]
+        add(Entry("features", level, "features", *_entities_nbytes(features.features)))
+        add(Entry("features", level, "sites", *_entities_nbytes(features.sites.values())))
+        mipmaps = map_entity.get(MapMipmaps)
+        if mipmaps is not None:
+            nbytes = sum(a.nbytes for a in mipmaps.graphics.values()) + sum(a.nbytes for a in mipmaps.priority.values())
+            add(Entry("mipmaps", level, "mipmaps", nbytes, len(mipmaps.graphics)))
+        regions = map_entity.get(MapConnectivity)
+        if regions is not None:
+            add(Entry("connectivity", level, "regions", regions.labels.nbytes, regions.count))
+        lights = map_entity.get(MapLights)
+        if lights is not None:
+            nbytes = lights.layer.nbytes + sum(patch.light.nbytes for patch in lights.patches.values())
+            add(Entry("lighting", level, "lights", nbytes, len(lights.patches)))
+
+    ctx = world[Context]
+    for actor in ctx.actors:
+        memory = actor.get(Memory)
+        if memory is None:
+            continue
+        owner = describe_actor(actor)
+        for map_entity, layer in memory.layers.items():
+            level = level_names.get(map_entity, "unlisted level")
+            add(Entry("memory", owner, f"{level} seen", layer.seen.nbytes, int(layer.get_seen().sum())))
+            add(Entry("memory", owner, f"{level} overrides", sys.getsizeof(layer.overrides), len(layer.overrides)))
+            objs_nbytes = sys.getsizeof(layer.objs) + sum(sys.getsizeof(graphic) for graphic in layer.objs.values())
+            add(Entry("memory", owner, f"{level} objects", objs_nbytes, len(layer.objs)))
+
+    heap = ctx.sched.heap
+    add(Entry("schedule", "world", "heap", sys.getsizeof(heap) + sum(sys.getsizeof(t) for t in heap), len(heap)))
+    return report
+
+
+def sample(world: ComponentDict, report: MemoryReport | None = None) -> MemoryReport:
+    """Take a report and add its total to the history of the world, return the report."""
+    if report is None:
+        report = take_report(world)
+    if MemoryHistory not in world:
+        world[MemoryHistory] = MemoryHistory()
+    world[MemoryHistory].samples.append(Sample(world[Context].sched.time, len(world[MapDict]), report.nbytes))
+    return report
+
+
+def format_bytes(nbytes: float) -> str:
+    """Return a byte count in human readable units.
+
+    >>> format_bytes(512), format_bytes(1536), format_bytes(3 * 1024 * 1024)
+    ('512B', '1.5KiB', '3.0MiB')
+    """
+    if nbytes < 1024:
+        return f"{nbytes:.0f}B"
+    if nbytes < 1024 * 1024:
+        return f"{nbytes / 1024:.1f}KiB"
+    return f"{nbytes / (1024 * 1024):.1f}MiB"
+
+
+def format_report(world: ComponentDict, report: MemoryReport, top: int = 10) -> list[str]:
+    """Return a summary of a report and the growth history of `world` as lines of text."""
+    lines = [f"Total: {format_bytes(report.nbytes)} in {len(world[MapDict])} levels"]
+    for section, nbytes in report.by_section().items():
+        lines.append(f"  {section}: {format_bytes(nbytes)}")
+    lines.append(f"Largest {top}:")
+    for owner, nbytes in list(report.by_owner().items())[:top]:
+        lines.append(f"  {owner}: {format_bytes(nbytes)}")
+    history = world.get(MemoryHistory)
+    if history is not None and len(history.samples) > 1:
+        first, last = history.samples[0], history.samples[-1]
+        lines.append(
+            f"Growth: {format_bytes(first.nbytes)} at turn {first.turn} ({first.levels} levels)"
+            f" to {format_bytes(last.nbytes)} at turn {last.turn} ({last.levels} levels)"
+        )
+    return lines
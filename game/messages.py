@@ -1,3 +1,8 @@
+import textwrap
+from collections import deque
+from pathlib import Path
+from typing import Any, Iterator
+
 import attrs
 
 
@@ -5,19 +10,81 @@
 class Message:
     text: str
     count: int = 1
+    _layout: tuple[int, int, list[str]] | None = attrs.field(default=None, init=False, eq=False, repr=False)
+    """Cached `(width, count, lines)` of the last wrapped layout."""
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Save without the cached layout, it is rebuilt on the next `wrap`."""
+        return {"text": self.text, "count": self.count}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.text = state["text"]
+        self.count = state["count"]
+        self._layout = None
 
     def __str__(self) -> str:
         if self.count > 1:
             return f"{self.text} (x{self.count})"
         return self.text
 
+    def wrap(self, width: int) -> list[str]:
+        """Return the lines of this message wrapped to `width`.
+
+        The layout is cached until the width or the count of this message changes.
+
+        >>> Message("The quick brown fox.", count=2).wrap(12)
+        ['The quick', 'brown fox.', '(x2)']
+        """
+        if self._layout is None or self._layout[:2] != (width, self.count):
+            self._layout = width, self.count, textwrap.wrap(str(self), width) or [""]
+        return self._layout[2]
+
+
+SPILL_BATCH = 100
+"""Number of dropped messages which are written to the spill file at once."""
+
 
 @attrs.define
 class MessageLog:
-    log: list[Message] = attrs.field(factory=list)
+    max_size: int = 1000
+    """The number of messages kept in memory."""
+    spill_path: Path | None = None
+    """If set then messages dropped from `log` are appended to this file."""
+    log: deque[Message] = attrs.field(default=attrs.Factory(lambda self: deque(maxlen=self.max_size), takes_self=True))
+    _unwritten: list[str] = attrs.field(factory=list, repr=False)
+    """Dropped messages waiting to be written to `spill_path`, these are saved along with the log."""
 
     def append(self, text: str) -> None:
         if self.log and self.log[-1].text == text:
             self.log[-1].count += 1
             return
+        if len(self.log) == self.log.maxlen:
+            self._spill(self.log[0])
         self.log.append(Message(text))
+
+    def _spill(self, message: Message) -> None:
+        """Queue a message which is about to be dropped to be written to the history file."""
+        if self.spill_path is None:
+            return
+        self._unwritten.append(str(message))
+        if len(self._unwritten) >= SPILL_BATCH:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all dropped messages to the history file."""
+        if self.spill_path is None or not self._unwritten:
+            return
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.spill_path.open("a", encoding="utf-8") as f:
+            f.writelines(f"{line}\n" for line in self._unwritten)
+        self._unwritten.clear()
+
+    def history(self) -> Iterator[str]:
+        """Iterate over the full message history, including messages which were spilled to disk."""
+        if self.spill_path is not None and self.spill_path.exists():
+            with self.spill_path.open(encoding="utf-8") as f:
+                for line in f:
+                    yield line.rstrip("\n")
+        yield from self._unwritten
+        for message in self.log:
+            yield str(message)
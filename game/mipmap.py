@@ -0,0 +1,130 @@
+"""Cached downsampled graphics of a map, used by the zoomed out overview."""
+
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+import tcod.console
+from numpy.typing import NDArray
+from tcod.ec import ComponentDict
+
+from game.components import Graphic, MapFeatures
+from game.map import Map
+from game.map_attrs import a_tiles
+from game.tiles import TileDB
+
+ZOOM_LEVELS = (1, 2, 4, 8)
+"""Supported reduction factors, each level is half the size of the previous one."""
+BLOCK = ZOOM_LEVELS[-1]
+"""Size of the blocks which are refreshed together, one cell of the most reduced level."""
+
+
+class MapMipmaps:
+    """Downsampled graphics for each zoom level of a map.
+
+    This is stored as a component of a map entity and is refreshed lazily.
+    Call `invalidate` after changing the tiles or sites of a map.
+    """
+
+    def __init__(self) -> None:
+        self.graphics: dict[int, NDArray[Any]] = {}
+        """Graphics for each zoom level, padded to a multiple of `BLOCK`."""
+        self.priority: dict[int, NDArray[np.int8]] = {}
+        """The importance of the glyph shown by each cell, sites show over tiles when reduced."""
+        self.dirty: set[tuple[int, int]] = set()
+        """Block (i, j) indexes which need to be refreshed."""
+
+
+def invalidate(map_entity: ComponentDict, x: int, y: int, width: int = 1, height: int = 1) -> None:
+    """Mark an area of a map as changed so that its cached overview is refreshed.
+
+    The area is clipped to the map, changes outside of it are ignored.
+    """
+    mipmaps = map_entity.get(MapMipmaps)
+    if mipmaps is None:
+        return
+    map = map_entity[Map]
+    left, top = max(x, 0), max(y, 0)
+    right, bottom = min(x + width, map.width), min(y + height, map.height)
+    if left >= right or top >= bottom:
+        return
+    for i in range(top // BLOCK, (bottom - 1) // BLOCK + 1):
+        for j in range(left // BLOCK, (right - 1) // BLOCK + 1):
+            mipmaps.dirty.add((i, j))
+
+
+def get_level(world: ComponentDict, map_entity: ComponentDict, zoom: int) -> NDArray[Any]:
+    """Return the graphics of a map reduced by `zoom`, refreshing any changed blocks first."""
+    assert zoom in ZOOM_LEVELS
+    mipmaps = map_entity.get(MapMipmaps)
+    if mipmaps is None:
+        mipmaps = map_entity[MapMipmaps] = MapMipmaps()
+        _build(world, map_entity, mipmaps)
+    elif mipmaps.dirty:
+        for i, j in mipmaps.dirty:
+            _update_block(world, map_entity, mipmaps, i, j)
+        mipmaps.dirty.clear()
+    return mipmaps.graphics[zoom]
+
+
+def _build(world: ComponentDict, map_entity: ComponentDict, mipmaps: MapMipmaps) -> None:
+    """Allocate and fill all levels."""
+    map = map_entity[Map]
+    height = -(-map.height // BLOCK) * BLOCK
+    width = -(-map.width // BLOCK) * BLOCK
+    for zoom in ZOOM_LEVELS:
+        mipmaps.graphics[zoom] = np.zeros((height // zoom, width // zoom), dtype=tcod.console.rgb_graphic)
+        mipmaps.priority[zoom] = np.full((height // zoom, width // zoom), -1, dtype=np.int8)
+    mipmaps.graphics[1]["ch"] = ord(" ")
+    mipmaps.graphics[1][: map.height, : map.width] = world[TileDB].data["graphic"][map[a_tiles]]
+    mipmaps.priority[1][: map.height, : map.width] = 0
+    for pos, site in map_entity[MapFeatures].sites.items():
+        if 0 <= pos.x < map.width and 0 <= pos.y < map.height:  # Sites may be placed off the map by DebugQuery.
+            _draw_site(mipmaps, pos.x, pos.y, site[Graphic])
+    for prev_zoom, zoom in zip(ZOOM_LEVELS, ZOOM_LEVELS[1:]):
+        _reduce(mipmaps, prev_zoom, zoom, np.s_[:, :])
+
+
+def _update_block(world: ComponentDict, map_entity: ComponentDict, mipmaps: MapMipmaps, i: int, j: int) -> None:
+    """Refresh one block of every level from the map data."""
+    map = map_entity[Map]
+    y, x = i * BLOCK, j * BLOCK
+    world_slice = np.s_[y : min(y + BLOCK, map.height), x : min(x + BLOCK, map.width)]
+    mipmaps.graphics[1][world_slice] = world[TileDB].data["graphic"][map[a_tiles][world_slice]]
+    mipmaps.priority[1][world_slice] = 0
+    for pos, site in map_entity[MapFeatures].sites.items():
+        if y <= pos.y < min(y + BLOCK, map.height) and x <= pos.x < min(x + BLOCK, map.width):
+            _draw_site(mipmaps, pos.x, pos.y, site[Graphic])
+    for prev_zoom, zoom in zip(ZOOM_LEVELS, ZOOM_LEVELS[1:]):
+        size = BLOCK // zoom
+        _reduce(mipmaps, prev_zoom, zoom, np.s_[i * size : (i + 1) * size, j * size : (j + 1) * size])
+
+
+def _draw_site(mipmaps: MapMipmaps, x: int, y: int, graphic: Graphic) -> None:
+    mipmaps.graphics[1][["ch", "fg"]][y, x] = graphic.ch, graphic.fg
+    mipmaps.priority[1][y, x] = 1
+
+
+def _reduce(mipmaps: MapMipmaps, prev_zoom: int, zoom: int, out_slice: tuple[slice, slice]) -> None:
+    """Fill `out_slice` of a level from the 2x2 cells of the previous level.
+
+    The glyph of the most important cell is used, background colors are averaged.
+    """
+    out = mipmaps.graphics[zoom][out_slice]
+    out_priority = mipmaps.priority[zoom][out_slice]
+    height, width = out.shape
+    src_slice = tuple(
+        slice(s.indices(n)[0] * 2, s.indices(n)[0] * 2 + size * 2)
+        for s, n, size in zip(out_slice, mipmaps.graphics[zoom].shape, out.shape)
+    )
+    # Reshape to (height, width, 4) where the last axis holds the cells of each 2x2 block.
+    src = mipmaps.graphics[prev_zoom][src_slice].reshape(height, 2, width, 2).swapaxes(1, 2).reshape(height, width, 4)
+    src_priority = (
+        mipmaps.priority[prev_zoom][src_slice].reshape(height, 2, width, 2).swapaxes(1, 2).reshape(height, width, 4)
+    )
+    best = np.argmax(src_priority, axis=2)[..., np.newaxis]
+    out["ch"] = np.take_along_axis(src["ch"], best, axis=2)[..., 0]
+    out["fg"] = np.take_along_axis(src["fg"], best[..., np.newaxis], axis=2)[:, :, 0]
+    out["bg"] = src["bg"].mean(axis=2, dtype=np.float32).round().astype(np.uint8)
+    out_priority[...] = np.take_along_axis(src_priority, best, axis=2)[..., 0]
@@ -0,0 +1,31 @@
+import os
+import sys
+from pathlib import Path
+
+APP_NAME = "7drl-2023"
+
+
+def get_cache_dir() -> Path:
+    """Return the directory for this games disposable cache files, creating it if needed."""
+    if sys.platform == "win32":
+        base = Path(os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local"))
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Caches"
+    else:
+        base = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    cache_dir = base / APP_NAME
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def get_data_dir() -> Path:
+    """Return the directory for this games persistent data such as saves, creating it if needed."""
+    if sys.platform == "win32":
+        base = Path(os.environ.get("APPDATA", Path.home() / "AppData" / "Roaming"))
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Application Support"
+    else:
+        base = Path(os.environ.get("XDG_DATA_HOME", Path.home() / ".local" / "share"))
+    data_dir = base / APP_NAME
+    data_dir.mkdir(parents=True, exist_ok=True)
+    return data_dir
@@ -0,0 +1,154 @@
+"""Timing of the hot phases of the game, shown in the sidebar and exported for later study.
+
+Collection is disabled by default, then instrumented code only pays for a flag check.
+Times are inclusive, so a phase which calls another phase also counts the time spent in it.
+
+>>> set_enabled(True)
+>>> with section("example"):
+...     pass
+>>> set_enabled(False)
+>>> stats["example"].count
+1
+>>> with section("example"):
+...     pass
+>>> stats["example"].count
+1
+>>> stats.clear()
+"""
+
+from __future__ import annotations
+
+import contextlib
+import csv
+import functools
+import json
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, ContextManager, Iterator, ParamSpec, TypeVar
+
+import attrs
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+WINDOW = 120
+"""The number of recent samples kept for each phase."""
+
+stats: dict[str, PhaseStats] = {}
+"""Statistics of each timed phase, by name."""
+_enabled = False
+_NULL_SECTION = contextlib.nullcontext()
+
+
+@attrs.define
+class PhaseStats:
+    count: int = 0
+    """Total number of samples, including those which have left the window."""
+    total: float = 0.0
+    """Total seconds spent in this phase."""
+    recent: deque[float] = attrs.Factory(lambda: deque(maxlen=WINDOW))
+    """Seconds taken by the most recent samples."""
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+
+    def summary(self) -> dict[str, float]:
+        """Return the statistics of this phase in milliseconds, `mean` and `max` are of the recent samples only."""
+        recent = self.recent or (0.0,)
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": sum(recent) / len(recent) * 1000,
+            "max_ms": max(recent) * 1000,
+        }
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(enabled: bool) -> None:
+    """Start or stop collecting samples, collected statistics are kept."""
+    global _enabled
+    _enabled = enabled
+
+
+def record(name: str, seconds: float) -> None:
+    """Add a sample to the phase `name`."""
+    phase = stats.get(name)
+    if phase is None:
+        phase = stats[name] = PhaseStats()
+    phase.add(seconds)
+
+
+@contextlib.contextmanager
+def _timed_section(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def section(name: str) -> ContextManager[None]:
+    """Return a context manager which times its block as the phase `name`."""
+    if not _enabled:
+        return _NULL_SECTION
+    return _timed_section(name)
+
+
+def timed(name: str) -> Callable[[Callable[P, T]], Callable[P, T]]:
+    """Decorate a function so that its calls are timed as the phase `name`."""
+
+    def decorator(func: Callable[P, T]) -> Callable[P, T]:
+        @functools.wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def summarize() -> dict[str, dict[str, float]]:
+    """Return the statistics of all phases, slowest mean first."""
+    summaries = {name: phase.summary() for name, phase in stats.items()}
+    return dict(sorted(summaries.items(), key=lambda item: -item[1]["mean_ms"]))
+
+
+def export_json(path: Path) -> None:
+    path.write_text(json.dumps(summarize(), indent=2), encoding="utf-8")
+
+
+def export_csv(path: Path) -> None:
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["phase", "count", "total_ms", "mean_ms", "max_ms"])
+        for name, summary in summarize().items():
+            writer.writerow([name, *(summary[column] for column in ("count", "total_ms", "mean_ms", "max_ms"))])
+
+
+def export(directory: Path) -> Path:
+    """Export the statistics as both JSON and CSV to a timestamped file in `directory`, return the path without suffix."""
+    path = directory / time.strftime("profile-%Y%m%d-%H%M%S")
+    export_json(path.with_suffix(".json"))
+    export_csv(path.with_suffix(".csv"))
+    return path
+
+
+def get_overlay_lines(width: int) -> list[str]:
+    """Return the mean time of each phase formatted to fit in `width` columns."""
+    lines = []
+    for name, summary in summarize().items():
+        value = f"{summary['mean_ms']:.2f}ms"
+        lines.append(f"{name[: width - len(value) - 1]:<{width - len(value)}}{value}")
+    return lines
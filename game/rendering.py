@@ -1,4 +1,3 @@
-import itertools
 from typing import Any
 
 import numpy as np
@@ -8,42 +7,62 @@
 from tcod.ec import ComponentDict
 
 import game.actor_tools
-from game.components import Context, Graphic, MapFeatures, MapInfo, Position
+import game.lighting
+import game.mipmap
+import game.profiling
+from game.components import Context, MapFeatures, MapInfo, Position
 from game.map import Map
 from game.map_attrs import a_tiles
 from game.messages import MessageLog
+from game.sprites import LAYER_ACTOR, LAYER_FEATURE, LAYER_SITE, SpriteBatch
 from game.tiles import TileDB
 
 SHROUD = np.array([(0x20, (0, 0, 0), (0, 0, 0))], dtype=tcod.console.rgb_graphic)
+LOG_HEIGHT = 5
+SIDEBAR_WIDTH = 20
 
 
+def get_map_shape(console_size: tuple[int, int]) -> tuple[int, int]:
+    """Return the (height, width) of the map view drawn by `render_all` on a console of (width, height)."""
+    width, height = console_size
+    return max(0, height - LOG_HEIGHT), max(0, width - SIDEBAR_WIDTH)
+
+
+@game.profiling.timed("render_all")
 def render_all(world: ComponentDict, console: tcod.console.Console) -> None:
-    LOG_HEIGHT = 5
-    SIDEBAR_WIDTH = 20
     console.clear()
     # if __debug__:
     #    console.rgb[:] = 0x20, (0, 127, 0), (255, 0, 255)
     render_map(world, console.rgb[:-LOG_HEIGHT, :-SIDEBAR_WIDTH])
-    log_console = tcod.console.Console(console.width - SIDEBAR_WIDTH, LOG_HEIGHT)
-    side_console = tcod.console.Console(SIDEBAR_WIDTH, console.height)
-
-    y = log_console.height
-    for message in reversed(world[MessageLog].log):
-        text = str(message)
-        y -= tcod.console.get_height_rect(log_console.width, text)
-        log_console.print_box(0, y, log_console.width, 0, text, (255, 255, 255))
-        if y <= 0:
-            break
-    log_console.blit(console, dest_x=0, dest_y=console.height - log_console.height)
+    render_log(world, console, 0, console.height - LOG_HEIGHT, console.width - SIDEBAR_WIDTH, LOG_HEIGHT)
 
+    side_console = tcod.console.Console(SIDEBAR_WIDTH, console.height)
     side_console.print(0, 0, f"Turn: {world[Context].sched.time}", fg=(255, 255, 255))
+    if game.profiling.is_enabled():
+        for y, line in enumerate(game.profiling.get_overlay_lines(SIDEBAR_WIDTH), start=2):
+            side_console.print(0, y, line, fg=(0xAA, 0xAA, 0xAA))
     side_console.blit(console, dest_x=console.width - side_console.width, dest_y=0)
 
 
+def render_log(world: ComponentDict, console: tcod.console.Console, x: int, y: int, width: int, height: int) -> None:
+    """Render the most recent messages into a box, newest messages at the bottom."""
+    line_y = y + height
+    for message in reversed(world[MessageLog].log):
+        for line in reversed(message.wrap(width)):
+            line_y -= 1
+            if line_y < y:
+                return
+            console.print(x, line_y, line, fg=(255, 255, 255))
+
+
+@game.profiling.timed("render_map")
 def render_map(world: ComponentDict, out: NDArray[Any]) -> None:
     """Render the active world map, showing visible and remembered tiles/objects."""
     map = world[Context].active_map[Map]
     map_info = world[Context].active_map[MapInfo]
+    if map_info.zoom != 1:
+        render_overview(world, out)
+        return
     player = world[Context].player
     tiles_db = world[TileDB]
     player_memory = game.actor_tools.get_memory(world, player)
@@ -56,40 +75,29 @@ def render_map(world: ComponentDict, out: NDArray[Any]) -> None:
 
     visible_graphics = tiles_db.data["graphic"][world_view]
 
-    for obj in itertools.chain(
-        world[Context].active_map[MapFeatures].features,
-        world[Context].actors,
-    ):
-        pos = obj[Position]
-        screen_x = pos.x - camera_ij[1] - screen_slice[1].start
-        screen_y = pos.y - camera_ij[0] - screen_slice[0].start
-        if 0 <= screen_x < visible_graphics.shape[1] and 0 <= screen_y < visible_graphics.shape[0]:
-            graphic = obj[Graphic]
-            visible_graphics[["ch", "fg"]][screen_y, screen_x] = graphic.ch, graphic.fg
-
-    for pos, obj in world[Context].active_map[MapFeatures].sites.items():
-        screen_x = pos.x - camera_ij[1] - screen_slice[1].start
-        screen_y = pos.y - camera_ij[0] - screen_slice[0].start
-        if 0 <= screen_x < visible_graphics.shape[1] and 0 <= screen_y < visible_graphics.shape[0]:
-            graphic = obj[Graphic]
-            visible_graphics[["ch", "fg"]][screen_y, screen_x] = graphic.ch, graphic.fg
-
-    memory_graphics = tiles_db.data["graphic"][player_memory.tiles[world_slice]]
-
-    for pos, obj in player_memory.objs.items():
-        screen_x = pos.x - camera_ij[1] - screen_slice[1].start
-        screen_y = pos.y - camera_ij[0] - screen_slice[0].start
-        if 0 <= screen_x < visible_graphics.shape[1] and 0 <= screen_y < visible_graphics.shape[0]:
-            graphic = obj[Graphic]
-            memory_graphics[["ch", "fg"]][screen_y, screen_x] = graphic.ch, graphic.fg
-
-    memory_graphics["fg"] //= 2
-    memory_graphics["bg"] //= 2
+    sprites = SpriteBatch(world_slice)
+    sprites.add_sites(world[Context].active_map[MapFeatures].sites, LAYER_SITE)
+    sprites.add_objects(world[Context].active_map[MapFeatures].features, LAYER_FEATURE)
+    sprites.add_objects(world[Context].actors, LAYER_ACTOR)
+    sprites.draw(visible_graphics, (world_slice[0].start, world_slice[1].start))
+
+    light = game.lighting.get_light(world)
+    if light is not None:
+        brightness = np.minimum(light[world_slice], 1)
+        visible_graphics["fg"] = visible_graphics["fg"] * brightness
+        visible_graphics["bg"] = visible_graphics["bg"] * brightness
+
+    memory_tiles = player_memory.get_tiles(map[a_tiles], world_slice)
+    memory_graphics = tiles_db.remembered_graphic[memory_tiles]
+
+    memory_sprites = SpriteBatch(world_slice)
+    memory_sprites.add_graphics(player_memory.objs)
+    memory_sprites.draw(memory_graphics, (world_slice[0].start, world_slice[1].start), dim=True)
 
     full_bright = True  # If True show whole map as visible.
 
     out[screen_slice] = np.select(
-        [full_bright or player_fov.visible[world_slice], player_memory.tiles[world_slice] != 0],
+        [full_bright or player_fov.get_visible(world_slice), memory_tiles != 0],
         [visible_graphics, memory_graphics],
         SHROUD,
     )
@@ -98,3 +106,23 @@ def render_map(world: ComponentDict, out: NDArray[Any]) -> None:
         cursor_y = map_info.cursor.y - camera_ij[0]
         if 0 <= cursor_x < out.shape[1] and 0 <= cursor_y < out.shape[0]:
             out[["fg", "bg"]][cursor_y, cursor_x] = (0x0, 0x0, 0x0), (0xFF, 0xFF, 0xFF)
+
+
+def render_overview(world: ComponentDict, out: NDArray[Any]) -> None:
+    """Render the whole active map reduced by `MapInfo.zoom`, ignoring visibility."""
+    active_map = world[Context].active_map
+    map_info = active_map[MapInfo]
+    zoom = map_info.zoom
+    graphics = game.mipmap.get_level(world, active_map, zoom)
+    camera_x, camera_y = tcod.camera.get_camera(
+        out.T.shape, (map_info.camera_center.x // zoom, map_info.camera_center.y // zoom)
+    )
+    map_info.camera_vector = Position(camera_x * zoom, camera_y * zoom)
+
+    screen_slice, level_slice = tcod.camera.get_slices(out.shape, graphics.shape, (camera_y, camera_x))
+    out[screen_slice] = graphics[level_slice]
+    if map_info.cursor:
+        cursor_x = (map_info.cursor.x - map_info.camera_vector.x) // zoom
+        cursor_y = (map_info.cursor.y - map_info.camera_vector.y) // zoom
+        if 0 <= cursor_x < out.shape[1] and 0 <= cursor_y < out.shape[0]:
+            out[["fg", "bg"]][cursor_y, cursor_x] = (0x0, 0x0, 0x0), (0xFF, 0xFF, 0xFF)
@@ -0,0 +1,184 @@
+"""Recording of input sessions and deterministic headless replay.
+
+A recording is a gzip compressed JSON lines file.
+The first line is a header holding the world seed.
+Each following line is one batch of events as it was handed to the simulation, along with the console size.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import time
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any, Iterable, Iterator
+
+import attrs
+import tcod.console
+import tcod.event
+
+import g
+import game.commands
+import game.sim
+import game.states
+import game.world_logic
+import game.world_tools
+from game.components import Seed
+
+if TYPE_CHECKING:
+    from game.spectator import SpectatorServer
+
+logger = logging.getLogger(__name__)
+
+VERSION = 1
+
+_PARSED_ENUMS = (game.commands.System, game.commands.InGame)
+"""Enums whose parsed commands are stored with each key press."""
+
+
+def encode_event(event: tcod.event.Event) -> list[Any] | None:
+    """Return a converted event as a JSON compatible list, or None if the event isn't used by the game."""
+    match event:
+        case tcod.event.KeyDown() | tcod.event.KeyUp():
+            return [event.type, int(event.sym), int(event.scancode), int(event.mod), event.repeat]
+        case tcod.event.MouseMotion():
+            return [event.type, *event.position, *event.motion, event.state]
+        case tcod.event.MouseButtonDown() | tcod.event.MouseButtonUp():
+            return [event.type, *event.position, event.button]
+        case tcod.event.MouseWheel():
+            return [event.type, event.x, event.y, event.flipped]
+        case tcod.event.TextInput():
+            return [event.type, event.text]
+        case tcod.event.WindowEvent():
+            return ["WindowEvent", event.type]
+        case tcod.event.Quit():
+            return [event.type]
+    return None
+
+
+def decode_event(data: list[Any]) -> tcod.event.Event:
+    """Return the event encoded by `encode_event`."""
+    match data:
+        case ["KEYDOWN", sym, scancode, mod, repeat]:
+            return tcod.event.KeyDown(scancode, tcod.event.KeySym(sym), mod, repeat)
+        case ["KEYUP", sym, scancode, mod, repeat]:
+            return tcod.event.KeyUp(scancode, tcod.event.KeySym(sym), mod, repeat)
+        case ["MOUSEMOTION", x, y, dx, dy, state]:
+            return tcod.event.MouseMotion((x, y), (dx, dy), state=state)
+        case ["MOUSEBUTTONDOWN", x, y, button]:
+            return tcod.event.MouseButtonDown((x, y), button=button)
+        case ["MOUSEBUTTONUP", x, y, button]:
+            return tcod.event.MouseButtonUp((x, y), button=button)
+        case ["MOUSEWHEEL", x, y, flipped]:
+            return tcod.event.MouseWheel(x, y, flipped)
+        case ["TEXTINPUT", text]:
+            return tcod.event.TextInput(text)
+        case ["WindowEvent", type]:
+            return tcod.event.WindowEvent(type)
+        case ["QUIT"]:
+            return tcod.event.Quit()
+    raise ValueError(f"Unknown event record: {data!r}")
+
+
+def parse_commands(event: tcod.event.Event) -> list[str]:
+    """Return the names of the commands a key press parses to, used to detect changed keybindings on replay."""
+    commands = []
+    for enum in _PARSED_ENUMS:
+        command = game.commands.keybindings.parse(event, enum)
+        if command is not None:
+            commands.append(f"{enum.__name__}.{command.name}")
+    return commands
+
+
+class Recorder:
+    """Writes the events of a live session to a file."""
+
+    def __init__(self, path: Path, seed: int) -> None:
+        self.file: IO[str] = gzip.open(path, "wt", encoding="utf-8")
+        self._write({"version": VERSION, "seed": seed})
+
+    def _write(self, data: Any) -> None:
+        self.file.write(json.dumps(data, separators=(",", ":")))
+        self.file.write("\n")
+
+    def record(self, events: Iterable[tcod.event.Event], console_size: tuple[int, int]) -> None:
+        """Record one batch of converted events."""
+        records: list[list[Any]] = []
+        for event in events:
+            data = encode_event(event)
+            if data is None:
+                continue
+            if isinstance(event, tcod.event.KeyDown):
+                data.append(parse_commands(event))
+            records.append(data)
+        self._write([*console_size, records])
+
+    def close(self) -> None:
+        self.file.close()
+
+
+@attrs.define
+class ReplayStats:
+    batches: int = 0
+    events: int = 0
+    mismatched_commands: int = 0
+    batch_times: list[float] = attrs.Factory(list)
+    """Seconds spent on each batch, including drawing."""
+
+
+def read_recording(path: Path) -> tuple[int, Iterator[tuple[tuple[int, int], list[list[Any]]]]]:
+    """Return the seed and an iterator of `(console_size, event_records)` batches."""
+    file = gzip.open(path, "rt", encoding="utf-8")
+    header = json.loads(file.readline())
+    if header.get("version") != VERSION:
+        raise ValueError(f"Unsupported recording version: {header.get('version')!r}")
+
+    def batches() -> Iterator[tuple[tuple[int, int], list[list[Any]]]]:
+        with file:
+            for line in file:
+                width, height, records = json.loads(line)
+                yield (width, height), records
+
+    return header["seed"], batches()
+
+
+def replay(path: Path, spectator: SpectatorServer | None = None) -> ReplayStats:
+    """Replay a recording headless from a new world, as fast as possible.
+
+    If `spectator` is given then the frame of each batch is streamed to it.
+    """
+    seed, batches = read_recording(path)
+    g.world = game.world_tools.new_world(seed)
+    assert g.world[Seed].value == seed
+    g.state = [game.states.MainMenu(can_continue=False)]
+    game.world_logic.until_player_turn(g.world)
+    stats = ReplayStats()
+    try:
+        for console_size, records in batches:
+            events = []
+            for record in records:
+                if record[0] == "KEYDOWN":
+                    *record, commands = record
+                    event = decode_event(record)
+                    if parse_commands(event) != commands:
+                        stats.mismatched_commands += 1
+                else:
+                    event = decode_event(record)
+                events.append(event)
+            start = time.perf_counter()
+            game.sim.handle_events(events)
+            game.sim.update_view(console_size)
+            # The console is drawn every batch since rendering updates the camera, which mouse input depends on.
+            console = tcod.console.Console(*console_size)
+            g.state[-1].on_draw(console)
+            stats.batch_times.append(time.perf_counter() - start)
+            if spectator is not None:
+                spectator.publish(console.rgb)
+            stats.batches += 1
+            stats.events += len(events)
+    except SystemExit:
+        pass
+    if stats.mismatched_commands:
+        logger.warning("%i key presses parsed differently than when recorded.", stats.mismatched_commands)
+    return stats
@@ -0,0 +1,262 @@
+"""Binary save files for whole worlds and single levels.
+
+A save file is a small header followed by one record per map and then a final record for the rest of the world.
+A level file has the same layout with only the record of one map.
+Each record is a protocol 5 pickle with its NumPy buffers stored out-of-band and aligned after it,
+so array data is written as-is and loaded as views of the file without being decoded or copied.
+
+The world record refers to map entities, and to the features and sites of those maps, by persistent id.
+This keeps each map in its own record and preserves object identity across records.
+"""
+
+from __future__ import annotations
+
+import copyreg
+import io
+import os
+import pickle
+import struct
+from pathlib import Path
+from typing import IO, Any, Callable, Hashable, Iterable, Iterator
+
+import attrs
+from tcod.ec import ComponentDict
+
+from game.actor_types import ActiveFOV
+from game.components import MapDict, MapFeatures
+from game.connectivity import MapConnectivity
+from game.lighting import MapLights
+from game.mipmap import MapMipmaps
+
+MAGIC = b"7DRLSAVE"
+LEVEL_MAGIC = b"7DRLLEVL"
+VERSION = 4
+"""Increased whenever saved classes change incompatibly, older saves are refused."""
+ALIGN = 64
+"""Byte alignment of out-of-band buffers within a file."""
+
+TRANSIENT_COMPONENTS: frozenset[type[Any]] = frozenset({ActiveFOV, MapConnectivity, MapLights, MapMipmaps})
+"""Cached components which are not saved and will be recomputed after loading."""
+
+_FILE_HEADER = struct.Struct("<8sII")  # magic, version, map count
+_RECORD_HEADER = struct.Struct("<QI")  # pickle length, buffer count
+_BUFFER_LENGTH = struct.Struct("<Q")
+
+
+def _reduce_entity(entity: ComponentDict) -> tuple[Callable[..., Any], tuple[Any, ...], Any]:
+    """Pickle an entity without its transient components."""
+    state = entity.__getstate__()
+    state["_components"] = tuple(c for c in state["_components"] if type(c) not in TRANSIENT_COMPONENTS)
+    return copyreg.__newobj__, (type(entity),), state  # type: ignore[attr-defined]
+
+
+_DISPATCH_TABLE: dict[type, Callable[[Any], Any]] = {ComponentDict: _reduce_entity}
+
+
+@attrs.define
+class Record:
+    """A pickle and the out-of-band buffers it was pickled with."""
+
+    data: bytes
+    buffers: list[memoryview]
+
+    def copy(self) -> Record:
+        """Return a record which owns copies of its buffers, so that it is unaffected by later changes to arrays."""
+        return Record(self.data, [memoryview(bytes(buffer)) for buffer in self.buffers])
+
+
+def get_map_objects(map_entity: ComponentDict) -> list[ComponentDict]:
+    """Return the entities owned by a map which other records may refer to."""
+    features = map_entity[MapFeatures]
+    return [*features.features, *features.sites.values()]
+
+
+def get_persistent_ids(maps: Iterable[ComponentDict]) -> dict[int, tuple[Hashable, ...]]:
+    """Return the persistent ids of map entities and their objects, keyed by `id()` of each object."""
+    ids: dict[int, tuple[Hashable, ...]] = {}
+    for i, map_entity in enumerate(maps):
+        ids[id(map_entity)] = ("map", i)
+        for j, obj in enumerate(get_map_objects(map_entity)):
+            ids[id(obj)] = ("obj", i, j)
+    return ids
+
+
+class _Pickler(pickle.Pickler):
+    def __init__(self, file: IO[bytes], buffers: list[memoryview], persistent_ids: dict[int, tuple[Hashable, ...]]):
+        super().__init__(file, protocol=5, buffer_callback=lambda buffer: buffers.append(buffer.raw()))
+        self.dispatch_table = _DISPATCH_TABLE
+        self._persistent_ids = persistent_ids
+
+    def persistent_id(self, obj: Any) -> tuple[Hashable, ...] | None:
+        return self._persistent_ids.get(id(obj))
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file: IO[bytes], buffers: Iterable[memoryview], maps: list[tuple[ComponentDict, list[Any]]]):
+        super().__init__(file, buffers=buffers)
+        self._maps = maps
+
+    def persistent_load(self, pid: Any) -> Any:
+        match pid:
+            case ("map", i):
+                return self._maps[i][0]
+            case ("obj", i, j):
+                return self._maps[i][1][j]
+        raise pickle.UnpicklingError(f"Unknown persistent id: {pid!r}")
+
+
+def encode(obj: Any, persistent_ids: dict[int, tuple[Hashable, ...]] | None = None) -> Record:
+    """Pickle `obj` into a record, arrays are referenced by the record instead of copied."""
+    buffers: list[memoryview] = []
+    file = io.BytesIO()
+    _Pickler(file, buffers, persistent_ids or {}).dump(obj)
+    return Record(file.getvalue(), buffers)
+
+
+def decode(
+    data: bytes | memoryview, buffers: Iterable[Any], maps: list[tuple[ComponentDict, list[Any]]] | None = None
+) -> Any:
+    """Unpickle a record made by `encode`.
+
+    `maps` are the decoded records of `encode_map` which the persistent ids of this record refer to.
+    Arrays are views of `buffers`, so they are writable if the buffers are.
+    """
+    return _Unpickler(io.BytesIO(data), buffers, maps or []).load()
+
+
+def encode_map(map_entity: ComponentDict) -> Record:
+    """Return the record of one map entity and the objects it owns."""
+    return encode((map_entity, get_map_objects(map_entity)))
+
+
+def encode_world(world: ComponentDict) -> tuple[list[Record], Record]:
+    """Return the map records and world record of `world`."""
+    maps = list(world[MapDict].values())
+    return [encode_map(map_entity) for map_entity in maps], encode(world, get_persistent_ids(maps))
+
+
+def _padding(offset: int) -> int:
+    return -offset % ALIGN
+
+
+def write_records(path: Path, map_records: Iterable[Record], world_record: Record, magic: bytes = MAGIC) -> None:
+    """Write records to a save file, replacing any existing file only once it is complete."""
+    map_records = list(map_records)
+    temp_path = path.with_name(path.name + ".tmp")
+    with temp_path.open("wb") as f:
+        offset = f.write(_FILE_HEADER.pack(magic, VERSION, len(map_records)))
+        for record in (*map_records, world_record):
+            offset += f.write(_RECORD_HEADER.pack(len(record.data), len(record.buffers)))
+            for buffer in record.buffers:
+                offset += f.write(_BUFFER_LENGTH.pack(buffer.nbytes))
+            offset += f.write(record.data)
+            for buffer in record.buffers:
+                offset += f.write(bytes(_padding(offset)))
+                offset += f.write(buffer)
+    os.replace(temp_path, path)
+
+
+def _read_records(data: memoryview) -> Iterator[tuple[memoryview, list[memoryview]]]:
+    """Yield the pickle and buffers of each record following the file header of `data`."""
+    offset = _FILE_HEADER.size
+    while offset < len(data):
+        pickle_length, buffer_count = _RECORD_HEADER.unpack_from(data, offset)
+        offset += _RECORD_HEADER.size
+        lengths = [_BUFFER_LENGTH.unpack_from(data, offset + i * _BUFFER_LENGTH.size)[0] for i in range(buffer_count)]
+        offset += buffer_count * _BUFFER_LENGTH.size
+        pickle_data = data[offset : offset + pickle_length]
+        offset += pickle_length
+        buffers = []
+        for length in lengths:
+            offset += _padding(offset)
+            buffers.append(data[offset : offset + length])
+            offset += length
+        yield pickle_data, buffers
+
+
+def _read_file(path: Path, expected_magic: bytes) -> tuple[memoryview, int]:
+    """Return the contents of a file and its map count after checking its header."""
+    with path.open("rb") as f:
+        buffer = bytearray(os.fstat(f.fileno()).st_size)
+        f.readinto(buffer)
+    data = memoryview(buffer)
+    if len(data) < _FILE_HEADER.size:
+        raise ValueError(f"{path} is truncated.")
+    magic, version, map_count = _FILE_HEADER.unpack_from(data)
+    if magic != expected_magic:
+        raise ValueError(f"{path} is not a {'save' if expected_magic == MAGIC else 'level'} file.")
+    if version != VERSION:
+        raise ValueError(f"Unsupported save version: {version!r}")
+    return data, map_count
+
+
+def save_world(world: ComponentDict, path: Path) -> None:
+    """Save `world` to `path`."""
+    write_records(path, *encode_world(world))
+
+
+def load_world(path: Path) -> ComponentDict:
+    """Return the world saved at `path`.
+
+    Map arrays are writable views of the loaded file.
+
+    >>> import tempfile
+    >>> import game.actor_tools, game.level_cache, game.map_tools, game.world_tools
+    >>> from game.actor_types import Memory
+    >>> from game.components import Context, Graphic, Position
+    >>> from game.map import Map
+    >>> from game.map_attrs import a_tiles
+    >>> from game.mapgen.caves import CaveMap
+    >>> game.level_cache.set_enabled(False)
+    >>> world = game.world_tools.new_world(0)
+    >>> game.map_tools.activate_map(world, CaveMap(1))
+    >>> player = world[Context].player
+    >>> player[Position] = world[Context].active_map[MapFeatures].features[0][Position]
+    >>> _ = game.actor_tools.compute_fov(world, player)  # Explore the cave around the player.
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     save_world(world, Path(directory, "world.sav"))
+    ...     loaded = load_world(Path(directory, "world.sav"))
+    >>> game.level_cache.set_enabled(True)
+    >>> maps, loaded_maps = world[MapDict], loaded[MapDict]
+    >>> maps.keys() == loaded_maps.keys()
+    True
+    >>> all((maps[key][Map][a_tiles] == loaded_maps[key][Map][a_tiles]).all() for key in maps)
+    True
+    >>> def describe(features): return [(obj[Position], obj[Graphic]) for obj in features.features]
+    >>> all(describe(maps[key][MapFeatures]) == describe(loaded_maps[key][MapFeatures]) for key in maps)
+    True
+    >>> loaded_cave = loaded_maps[CaveMap(1)]
+    >>> loaded[Context].active_map is loaded_cave
+    True
+    >>> layers = loaded[Context].player[Memory].layers
+    >>> all(any(map_entity is layer_map for map_entity in loaded_maps.values()) for layer_map in layers)
+    True
+    >>> seen = player[Memory].layers[maps[CaveMap(1)]].seen
+    >>> seen.any() and (layers[loaded_cave].seen == seen).all()
+    True
+    """
+    data, map_count = _read_file(path, MAGIC)
+    maps: list[tuple[ComponentDict, list[Any]]] = []
+    for i, (pickle_data, buffers) in enumerate(_read_records(data)):
+        obj = decode(pickle_data, buffers, maps)
+        if i < map_count:
+            maps.append(obj)
+            continue
+        assert isinstance(obj, ComponentDict)
+        return obj
+    raise ValueError(f"{path} is truncated.")
+
+
+def save_map(map_entity: ComponentDict, path: Path) -> None:
+    """Save a single map entity to a level file at `path`."""
+    write_records(path, [], encode_map(map_entity), magic=LEVEL_MAGIC)
+
+
+def load_map(path: Path) -> ComponentDict:
+    """Return the map entity saved at `path` by `save_map`."""
+    data, _ = _read_file(path, LEVEL_MAGIC)
+    for pickle_data, buffers in _read_records(data):
+        map_entity, _ = decode(pickle_data, buffers)
+        assert isinstance(map_entity, ComponentDict)
+        return map_entity
+    raise ValueError(f"{path} is truncated.")
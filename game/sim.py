@@ -0,0 +1,236 @@
+"""Runs the state stack and world simulation on a worker thread.
+
+The main thread only collects input and presents frames, so the window stays responsive while a turn is simulated.
+The worker renders each result to an offscreen console and publishes it through a `FrameBuffer`.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from typing import TYPE_CHECKING, Any, Iterable, NamedTuple
+
+import numpy as np
+import tcod.console
+import tcod.event
+from numpy.typing import NDArray
+
+import g
+import game.commands
+import game.mapgen.world
+import game.paths
+import game.profiling
+import game.rendering
+import game.snapshots
+import game.state
+import game.states
+import game.world_logic
+from game.components import Context
+from game.messages import MessageLog
+
+if TYPE_CHECKING:
+    from game.autosave import Autosave
+    from game.replay import Recorder
+    from game.spectator import SpectatorServer
+
+logger = logging.getLogger(__name__)
+
+history = game.snapshots.History()
+"""Snapshots of the world after each turn, for rewinding."""
+STREAM_REDRAW_INTERVAL = 1 / 30
+"""Seconds between redraws while chunks are generated in the background, see `SimulationThread`."""
+
+
+def handle_state(result: game.state.StateResult) -> None:
+    match result:
+        case game.state.Push(state):
+            g.state.append(state)
+        case game.state.Pop():
+            g.state.pop()
+        case game.state.Reset(state):
+            g.state = [state]
+        case None:
+            pass
+        case _:
+            assert False
+
+
+def handle_debug_command(command: game.commands.Debug) -> None:
+    match command:
+        case game.commands.Debug.TOGGLE_PROFILER:
+            game.profiling.set_enabled(not game.profiling.is_enabled())
+        case game.commands.Debug.EXPORT_PROFILE:
+            try:
+                path = game.profiling.export(game.paths.get_data_dir())
+            except OSError:
+                logger.exception("Failed to export profile.")
+                g.world[MessageLog].append("Failed to export profile.")
+            else:
+                g.world[MessageLog].append(f"Profile saved to {path}.json/csv")
+        case game.commands.Debug.REWIND:
+            world = history.rewind()
+            if world is None:
+                g.world[MessageLog].append("Nothing to rewind.")
+            else:
+                g.world = world
+                g.world[MessageLog].append("Rewound one turn.")
+
+
+def handle_events(events: Iterable[tcod.event.Event]) -> None:
+    """Pass converted events to the active state, then run the world until the players turn if any time has passed."""
+    sched = g.world[Context].sched
+    next_uid = sched.next_uid
+    for event in events:
+        if isinstance(event, tcod.event.KeyDown):
+            debug_command = game.commands.keybindings.parse(event=event, enum=game.commands.Debug)
+            if debug_command is not None:
+                handle_debug_command(debug_command)
+                sched = g.world[Context].sched  # Debug commands pass no time, even if they replace the world.
+                next_uid = sched.next_uid
+                continue
+        with game.profiling.section("on_event"):
+            handle_state(g.state[-1].on_event(event))
+    if g.world[Context].sched is not sched or sched.next_uid != next_uid:
+        game.world_logic.until_player_turn(g.world)
+        history.take(g.world)
+    elif not history.follows(g.world):
+        history.take(g.world)  # The starting point of a new or loaded world.
+
+
+def update_view(console_size: tuple[int, int]) -> None:
+    """Prepare the world to be drawn on a console of `console_size`, drawing only reads the world."""
+    game.mapgen.world.stream_chunks(g.world, game.rendering.get_map_shape(console_size))
+
+
+class FrameBuffer:
+    """A double buffer of rendered consoles.
+
+    The simulation thread writes to the back buffer while the main thread reads the front buffer.
+    The buffers are swapped under a lock once a frame is complete.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._front: NDArray[Any] | None = None
+        self._back: NDArray[Any] | None = None
+        self.serial = 0
+        """Incremented each time a new frame is published."""
+
+    def publish(self, rgb: NDArray[Any]) -> None:
+        """Copy a finished frame into the back buffer and make it the front buffer."""
+        if self._back is None or self._back.shape != rgb.shape:
+            self._back = np.empty_like(rgb)
+        self._back[...] = rgb
+        with self._lock:
+            self._front, self._back = self._back, self._front
+            self.serial += 1
+
+    def read(self, out: NDArray[Any]) -> int:
+        """Copy the latest frame into `out` and return its serial number.
+
+        If the sizes differ then only the overlapping top-left area is copied.
+        """
+        with self._lock:
+            if self._front is not None:
+                height = min(out.shape[0], self._front.shape[0])
+                width = min(out.shape[1], self._front.shape[1])
+                out[:height, :width] = self._front[:height, :width]
+            return self.serial
+
+
+class _Batch(NamedTuple):
+    events: list[tcod.event.Event]
+    console_size: tuple[int, int]
+
+
+class SimulationThread(threading.Thread):
+    """Owns `g.world` and `g.state` once started.  Other threads must only interact with it through `submit`."""
+
+    def __init__(
+        self,
+        frames: FrameBuffer,
+        recorder: Recorder | None = None,
+        autosave: Autosave | None = None,
+        spectator: SpectatorServer | None = None,
+    ) -> None:
+        super().__init__(name="Simulation", daemon=True)
+        self.frames = frames
+        self.recorder = recorder
+        """If set then each handled batch of events is recorded by this thread."""
+        self.autosave = autosave
+        """If set then the world is autosaved between batches and when the game is quit."""
+        self.spectator = spectator
+        """If set then each published frame is also streamed to spectators."""
+        self.error: BaseException | None = None
+        """The exception which stopped this thread, such as SystemExit."""
+        self._queue: queue.SimpleQueue[_Batch | None] = queue.SimpleQueue()
+
+    def submit(self, events: list[tcod.event.Event], console_size: tuple[int, int]) -> None:
+        """Queue converted events for the simulation, a new frame will be published once they are handled."""
+        self._queue.put(_Batch(events, console_size))
+
+    def stop(self) -> None:
+        self._queue.put(None)
+
+    def _update_autosave(self, *, force: bool = False) -> None:
+        """Let the autosave snapshot the world, unless no game has been started yet."""
+        if self.autosave is not None and not isinstance(g.state[0], game.states.MainMenu):
+            self.autosave.update(g.world, force=force)
+
+    def run(self) -> None:
+        try:
+            self._handle_batches()
+            self._update_autosave(force=True)
+        except BaseException as exc:
+            if isinstance(exc, SystemExit):
+                self._update_autosave(force=True)
+            else:
+                logger.exception("Simulation thread crashed.")
+            self.error = exc
+
+    def _handle_batches(self) -> None:
+        """Handle queued events until `stop` is called.
+
+        While chunks of the active map are generated in the background the frame is also redrawn every
+        `STREAM_REDRAW_INTERVAL` seconds without waiting for input, so that finished chunks are shown.
+        """
+        console_size: tuple[int, int] | None = None
+        while True:
+            streaming = console_size is not None and game.mapgen.world.is_streaming(g.world)
+            try:
+                batch = self._queue.get(timeout=STREAM_REDRAW_INTERVAL if streaming else None)
+            except queue.Empty:
+                assert console_size is not None
+                update_view(console_size)
+                self._draw(console_size)
+                continue
+            if batch is None:
+                return
+            events = list(batch.events)
+            console_size = batch.console_size
+            # Handle everything which queued up during a slow turn before drawing again.
+            while True:
+                try:
+                    next_batch = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if next_batch is None:
+                    return
+                events += next_batch.events
+                console_size = next_batch.console_size
+            if self.recorder is not None:
+                self.recorder.record(events, console_size)
+            handle_events(events)
+            update_view(console_size)
+            self._update_autosave()  # The world is waiting on the player after handle_events.
+            self._draw(console_size)
+
+    def _draw(self, console_size: tuple[int, int]) -> None:
+        """Draw the active state and publish the frame."""
+        console = tcod.console.Console(*console_size)
+        with game.profiling.section("on_draw"):
+            g.state[-1].on_draw(console)
+        self.frames.publish(console.rgb)
+        if self.spectator is not None:
+            self.spectator.publish(console.rgb)
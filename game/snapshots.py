@@ -0,0 +1,271 @@
+"""In-memory snapshots of the world for each turn, so that the world can be rewound.
+
+Snapshots are made of the same records as save files, with their buffers split into fixed size blocks.
+Each snapshot shares the blocks which did not change with the previous snapshot, and shares the whole record of
+maps which were not active since the previous snapshot, so the memory taken by each snapshot grows with the changes
+made during its turn instead of with the size of the world.
+Taking a snapshot still pickles the active map and the world, which is cheap since arrays are out-of-band buffers.
+Tracked arrays, which report their changed rows to `game.dirty_rows`, reuse their previous copy and only copy the
+blocks of the rows which changed, other arrays are compared block by block with the previous snapshot.
+
+Maps are assumed to only change while they are the active map, as in `game.autosave`.
+"""
+
+from __future__ import annotations
+
+import collections
+import weakref
+from typing import Any, Callable, Self
+
+import attrs
+import numpy as np
+from numpy.typing import NDArray
+from tcod.ec import ComponentDict
+
+import game.dirty_rows
+import game.profiling
+import game.save
+from game.actor_types import Memory
+from game.components import Context, MapDict
+from game.map import Map, MapKey
+from game.map_attrs import a_tiles
+
+BLOCK_SIZE = 4096
+"""Bytes per shared block of a buffer."""
+
+
+@attrs.define(frozen=True)
+class SharedBuffer:
+    """An immutable copy of a buffer stored as blocks which may be shared with other copies."""
+
+    blocks: tuple[bytes, ...]
+
+    @classmethod
+    def from_buffer(cls, buffer: memoryview, previous: SharedBuffer | None = None) -> Self:
+        """Copy `buffer`, reusing the blocks of `previous` which are equal to the new ones.
+
+        >>> a = SharedBuffer.from_buffer(memoryview(bytes(BLOCK_SIZE * 2)))
+        >>> b = SharedBuffer.from_buffer(memoryview(bytes(BLOCK_SIZE) + b"x" * BLOCK_SIZE), a)
+        >>> b.blocks[0] is a.blocks[0], b.blocks[1] is a.blocks[1]
+        (True, False)
+        """
+        buffer = buffer.cast("B")
+        previous_blocks = previous.blocks if previous is not None else ()
+        blocks = []
+        for i, start in enumerate(range(0, buffer.nbytes, BLOCK_SIZE)):
+            block = buffer[start : start + BLOCK_SIZE].tobytes()
+            if i < len(previous_blocks) and previous_blocks[i] == block:
+                block = previous_blocks[i]
+            blocks.append(block)
+        return cls(tuple(blocks))
+
+    def updated(self, buffer: memoryview, start: int, stop: int) -> Self:
+        """Copy `buffer` which only differs from this buffer between the bytes `start` and `stop`.
+
+        >>> a = SharedBuffer.from_buffer(memoryview(bytes(BLOCK_SIZE * 3)))
+        >>> b = a.updated(memoryview(bytes(BLOCK_SIZE) + b"x" + bytes(BLOCK_SIZE * 2 - 1)), BLOCK_SIZE, BLOCK_SIZE + 1)
+        >>> [new is old for new, old in zip(b.blocks, a.blocks)], b.to_bytearray()[BLOCK_SIZE]
+        ([True, False, True], 120)
+        """
+        buffer = buffer.cast("B")
+        assert buffer.nbytes == sum(len(block) for block in self.blocks)
+        blocks = list(self.blocks)
+        for i in range(start // BLOCK_SIZE, -(-stop // BLOCK_SIZE)):
+            block = buffer[i * BLOCK_SIZE : (i + 1) * BLOCK_SIZE].tobytes()
+            if blocks[i] != block:
+                blocks[i] = block
+        return type(self)(tuple(blocks))
+
+    def to_bytearray(self) -> bytearray:
+        """Return a writable copy of this buffer."""
+        return bytearray().join(self.blocks)
+
+
+@attrs.define(frozen=True)
+class SharedRecord:
+    """A `game.save.Record` with shared buffers."""
+
+    data: bytes
+    buffers: tuple[SharedBuffer, ...]
+
+    @classmethod
+    def from_record(
+        cls,
+        record: game.save.Record,
+        previous: SharedRecord | None = None,
+        share: Callable[[memoryview, SharedBuffer | None], SharedBuffer] = SharedBuffer.from_buffer,
+    ) -> Self:
+        """Copy `record`, sharing blocks with the buffers of `previous` in the same order.
+
+        Each buffer is copied by `share` with the buffer of `previous` at its index.
+        """
+        previous_buffers = previous.buffers if previous is not None else ()
+        data = previous.data if previous is not None and previous.data == record.data else record.data
+        return cls(
+            data,
+            tuple(
+                share(buffer, previous_buffers[i] if i < len(previous_buffers) else None)
+                for i, buffer in enumerate(record.buffers)
+            ),
+        )
+
+    def decode(self, maps: list[tuple[ComponentDict, list[Any]]] | None = None) -> Any:
+        """Unpickle this record, arrays are new writable copies which do not affect this record."""
+        return game.save.decode(self.data, [buffer.to_bytearray() for buffer in self.buffers], maps)
+
+
+@attrs.define(frozen=True)
+class Snapshot:
+    """The world as it was at one point."""
+
+    time: int
+    """Scheduler time of the world."""
+    maps: tuple[tuple[MapKey, SharedRecord], ...]
+    """The records of each map in the order of `MapDict`."""
+    world: SharedRecord
+
+
+def _get_tracked_arrays(world: ComponentDict) -> dict[int, NDArray[Any]]:
+    """Return the arrays of `world` which report their changes to `game.dirty_rows`, keyed by `id()`.
+
+    These are the tiles of maps, changed by `game.map_tools.set_tile` and `set_tiles` once the map is generated,
+    and the seen masks of memories, changed by `MemoryLayer.remember`.
+    """
+    arrays = []
+    for map_entity in world[MapDict].values():
+        map = map_entity.get(Map)
+        if map is not None and a_tiles in map:
+            arrays.append(map[a_tiles])
+    for actor in world[Context].actors:
+        memory = actor.get(Memory)
+        if memory is not None:
+            arrays.extend(layer.seen for layer in memory.layers.values())
+    return {id(array): array for array in arrays}
+
+
+class History:
+    """The latest snapshots of a world, up to `capacity` of them.
+
+    Snapshots are compared with the previous snapshot, so a history only follows one world at a time.
+    Taking a snapshot of a different world than the last one clears the history first.
+    """
+
+    def __init__(self, capacity: int = 100) -> None:
+        self.snapshots: collections.deque[Snapshot] = collections.deque(maxlen=capacity)
+        self._world: weakref.ref[ComponentDict] | None = None
+        """The world of the latest snapshot."""
+        self._entities: dict[MapKey, ComponentDict] = {}
+        """The map entities which the map records of the latest snapshot were made from."""
+        self._active_key: MapKey | None = None
+        """The key of the active map of the latest snapshot."""
+        self._copies: dict[int, tuple[weakref.ref[NDArray[Any]], SharedBuffer]] = {}
+        """The latest copy of each tracked array, keyed by `id()` of the array."""
+
+    def __len__(self) -> int:
+        return len(self.snapshots)
+
+    def follows(self, world: ComponentDict) -> bool:
+        """Return True if the latest snapshot was taken of or restored to `world`."""
+        return self._world is not None and self._world() is world
+
+    def clear(self) -> None:
+        self.snapshots.clear()
+        self._world = None
+        self._entities = {}
+        self._active_key = None
+        self._copies = {}
+
+    def _follow(self, world: ComponentDict, entities: dict[MapKey, ComponentDict]) -> None:
+        self._world = weakref.ref(world)
+        self._entities = entities
+        active_map = world[Context].active_map
+        self._active_key = next((key for key, entity in entities.items() if entity is active_map), None)
+
+    def _share(
+        self, tracked: dict[int, NDArray[Any]], buffer: memoryview, previous: SharedBuffer | None
+    ) -> SharedBuffer:
+        """Copy `buffer`, only copying the changed rows of tracked arrays which were copied before."""
+        array = buffer.obj
+        if not isinstance(array, np.ndarray) or id(array) not in tracked:
+            return SharedBuffer.from_buffer(buffer, previous)
+        changes = game.dirty_rows.pop(array)
+        copy = self._copies.get(id(array))
+        if copy is None or copy[0]() is not array:
+            shared = SharedBuffer.from_buffer(buffer, previous)
+        elif changes is None:
+            shared = copy[1]
+        else:
+            row_size = buffer.nbytes // len(array)
+            shared = copy[1].updated(buffer, changes[0] * row_size, changes[1] * row_size)
+        self._copies[id(array)] = weakref.ref(array), shared
+        return shared
+
+    @game.profiling.timed("snapshot")
+    def take(self, world: ComponentDict) -> Snapshot:
+        """Add a snapshot of `world` and return it."""
+        if not self.follows(world):
+            self.clear()
+        previous = self.snapshots[-1] if self.snapshots else None
+        previous_maps = dict(previous.maps) if previous is not None else {}
+        active_map = world[Context].active_map
+        map_dict = world[MapDict]
+        tracked = _get_tracked_arrays(world)
+
+        def share(buffer: memoryview, previous: SharedBuffer | None) -> SharedBuffer:
+            return self._share(tracked, buffer, previous)
+
+        maps = []
+        for key, map_entity in map_dict.items():
+            record = previous_maps.get(key)
+            if (
+                record is None
+                or self._entities.get(key) is not map_entity
+                or map_entity is active_map
+                or key == self._active_key
+            ):
+                record = SharedRecord.from_record(game.save.encode_map(map_entity), record, share)
+            maps.append((key, record))
+        world_record = SharedRecord.from_record(
+            game.save.encode(world, game.save.get_persistent_ids(map_dict.values())),
+            previous.world if previous is not None else None,
+            share,
+        )
+        snapshot = Snapshot(world[Context].sched.time, tuple(maps), world_record)
+        self.snapshots.append(snapshot)
+        self._follow(world, dict(map_dict))
+        return snapshot
+
+    def restore(self, snapshot: Snapshot) -> ComponentDict:
+        """Return a new world decoded from `snapshot`, later snapshots will be taken of that world."""
+        maps: list[tuple[ComponentDict, list[Any]]] = [record.decode() for _, record in snapshot.maps]
+        world = snapshot.world.decode(maps)
+        assert isinstance(world, ComponentDict)
+        entities = {}
+        if self.snapshots and snapshot is self.snapshots[-1]:
+            # Otherwise the next snapshot can not reuse the map records of the latest one.
+            entities = {key: map_entity for (key, _), (map_entity, _) in zip(snapshot.maps, maps)}
+        self._copies = {}  # The arrays of the new world are copied in full by the next snapshot.
+        self._follow(world, entities)
+        return world
+
+    def rewind(self, turns: int = 1) -> ComponentDict | None:
+        """Drop the latest `turns` snapshots and return the world of the snapshot before them.
+
+        Returns None without changes if there are not enough snapshots.
+        """
+        if turns < 1 or len(self.snapshots) <= turns:
+            return None
+        for _ in range(turns):
+            self.snapshots.pop()
+        return self.restore(self.snapshots[-1])
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the blocks held by all snapshots, counting shared blocks once."""
+        seen: dict[int, int] = {}
+        for snapshot in self.snapshots:
+            for _, record in (*snapshot.maps, (None, snapshot.world)):
+                for buffer in record.buffers:
+                    for block in buffer.blocks:
+                        seen[id(block)] = len(block)
+        return sum(seen.values())
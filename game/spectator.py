@@ -0,0 +1,295 @@
+"""Streaming of rendered frames to spectators over a local socket.
+
+Frames are the `Console.rgb` arrays of rendered consoles.
+Only the cells which changed since the previous frame are sent, as runs of consecutive changed cells,
+and nothing is sent for frames which did not change, so the bandwidth depends on how much of the screen changes.
+Encoding is done on a background thread and only the latest frame is sent, frames published faster than they can be
+sent are skipped.
+
+A stream starts with a header holding `MAGIC` and `VERSION`, followed by messages which each hold one frame:
+a header of (width, height, run count), then a (start, length) pair of uint32 for each run,
+then the cells of all runs in `CELL_DTYPE`.
+A run starts at a flat index of the frame in row-major order.
+The first frame sent to a spectator is a single run covering the whole frame, as is any frame which changes size.
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+import socket
+import stat
+import struct
+import threading
+from pathlib import Path
+from typing import IO
+
+import numpy as np
+from numpy.typing import NDArray
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"7DRLSPEC"
+VERSION = 1
+DEFAULT_PORT = 7023
+CELL_DTYPE = np.dtype([("ch", "<i4"), ("fg", "u1", 3), ("bg", "u1", 3)])
+"""Cells as they are sent, the same fields as `Console.rgb` without padding."""
+SEND_TIMEOUT = 5.0
+"""Seconds a spectator may block a send before it is dropped."""
+
+_STREAM_HEADER = struct.Struct("<8sI")  # magic, version
+_FRAME_HEADER = struct.Struct("<HHI")  # width, height, run count
+_RUN_DTYPE = np.dtype("<u4")
+
+Address = tuple[str, int] | Path
+"""A TCP (host, port) or the path of a Unix socket."""
+
+
+def parse_address(text: str) -> Address:
+    """Parse "PORT", "HOST:PORT", or a Unix socket path.
+
+    >>> parse_address("7023"), parse_address("localhost:80"), parse_address("/tmp/game.sock")
+    (('127.0.0.1', 7023), ('localhost', 80), PosixPath('/tmp/game.sock'))
+    """
+    host, _, port = text.rpartition(":")
+    if port.isdigit():
+        return host or "127.0.0.1", int(port)
+    return Path(text)
+
+
+def to_cells(rgb: NDArray[np.void]) -> NDArray[np.void]:
+    """Return a copy of a `Console.rgb` array in `CELL_DTYPE`."""
+    cells: NDArray[np.void] = rgb.astype(CELL_DTYPE)
+    return cells
+
+
+def _as_bytes(cells: NDArray[np.void]) -> NDArray[np.uint8]:
+    """View cells as a (cells, bytes) array for comparisons."""
+    return cells.reshape(-1).view(np.uint8).reshape(-1, CELL_DTYPE.itemsize)
+
+
+def encode_diff(previous: NDArray[np.void] | None, frame: NDArray[np.void]) -> bytes | None:
+    """Return the message updating `previous` to `frame`, or None if they are the same.
+
+    Both frames must be in `CELL_DTYPE`, a full frame is encoded if `previous` is None or of a different shape.
+
+    >>> a = np.zeros((2, 3), CELL_DTYPE)
+    >>> b = a.copy()
+    >>> b["ch"][1, 1:] = ord("@")
+    >>> len(encode_diff(None, a)), len(encode_diff(a, b)), encode_diff(b, b)
+    (76, 36, None)
+    """
+    height, width = frame.shape
+    flat = frame.reshape(-1)
+    if previous is None or previous.shape != frame.shape:
+        runs = np.array([[0, flat.size]], _RUN_DTYPE)
+        cells = flat
+    else:
+        changed = (_as_bytes(previous) != _as_bytes(frame)).any(axis=1)
+        if not changed.any():
+            return None
+        edges = np.flatnonzero(np.diff(changed, prepend=False, append=False))  # Alternating run starts and stops.
+        starts, stops = edges[0::2], edges[1::2]
+        runs = np.stack([starts, stops - starts], axis=1).astype(_RUN_DTYPE)
+        cells = flat[changed]
+    return _FRAME_HEADER.pack(width, height, len(runs)) + runs.tobytes() + cells.tobytes()
+
+
+def _read_exact(stream: IO[bytes], size: int) -> bytes:
+    data = stream.read(size)
+    if len(data) != size:
+        raise EOFError("Spectator stream ended in the middle of a frame.")
+    return data
+
+
+class FrameDecoder:
+    """Rebuilds frames from the messages of a stream.
+
+    >>> a = np.zeros((2, 3), CELL_DTYPE)
+    >>> b = a.copy()
+    >>> b["ch"][0, 0] = b["ch"][1, 2] = ord("@")
+    >>> decoder = FrameDecoder()
+    >>> decoder.decode(encode_diff(None, a)), decoder.decode(encode_diff(a, b))
+    (True, True)
+    >>> decoder.frame is not None and decoder.frame.tobytes() == b.tobytes()
+    True
+    """
+
+    def __init__(self) -> None:
+        self.frame: NDArray[np.void] | None = None
+        """The latest frame in `CELL_DTYPE`, None until the first frame is read."""
+        self.bytes_read = 0
+        """Total size of the messages read."""
+
+    def read(self, stream: IO[bytes]) -> bool:
+        """Read one message from `stream` and apply it to `frame`, return False if the stream ended instead."""
+        header = stream.read(_FRAME_HEADER.size)
+        if not header:
+            return False
+        if len(header) != _FRAME_HEADER.size:
+            raise EOFError("Spectator stream ended in the middle of a frame.")
+        width, height, run_count = _FRAME_HEADER.unpack(header)
+        runs = np.frombuffer(_read_exact(stream, run_count * 2 * _RUN_DTYPE.itemsize), _RUN_DTYPE).reshape(-1, 2)
+        starts, lengths = runs[:, 0].astype(np.intp), runs[:, 1].astype(np.intp)
+        total = int(lengths.sum())
+        cells = np.frombuffer(_read_exact(stream, total * CELL_DTYPE.itemsize), CELL_DTYPE)
+        if self.frame is None or self.frame.shape != (height, width):
+            self.frame = np.zeros((height, width), CELL_DTYPE)
+        run_offsets = np.cumsum(lengths) - lengths
+        indexes = np.repeat(starts - run_offsets, lengths) + np.arange(total)
+        self.frame.reshape(-1)[indexes] = cells
+        self.bytes_read += _FRAME_HEADER.size + runs.nbytes + cells.nbytes
+        return True
+
+    def decode(self, message: bytes) -> bool:
+        """Apply a single message."""
+        return self.read(io.BytesIO(message))
+
+
+def read_stream_header(stream: IO[bytes]) -> None:
+    """Read and check the header at the start of a stream."""
+    header = stream.read(_STREAM_HEADER.size)
+    if len(header) != _STREAM_HEADER.size:
+        raise EOFError("Spectator stream ended before it started.")
+    magic, version = _STREAM_HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("Not a spectator stream.")
+    if version != VERSION:
+        raise ValueError(f"Unsupported spectator stream version: {version!r}")
+
+
+def connect(address: Address) -> socket.socket:
+    """Return a socket connected to a spectator server."""
+    if isinstance(address, Path):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(str(address))
+        return sock
+    return socket.create_connection(address)
+
+
+def _remove_socket(path: Path) -> None:
+    """Remove the Unix socket at `path` if there is one, raise FileExistsError if anything else is there."""
+    try:
+        mode = path.lstat().st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"Can not use {path} for spectators, the path is taken by something other than a socket.")
+    path.unlink(missing_ok=True)
+
+
+class SpectatorServer:
+    """Sends published frames to every connected spectator.
+
+    `publish` only copies the frame, encoding and sending are done on a background thread.
+    """
+
+    def __init__(self, address: Address) -> None:
+        self.address = address
+        if isinstance(address, Path):
+            _remove_socket(address)  # Left over from a previous session.
+            self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._listener.bind(str(address))
+            self._listener.listen()
+        else:
+            self._listener = socket.create_server(address)
+        self.bytes_sent = 0
+        """Total bytes sent to all spectators."""
+        self._clients: list[socket.socket] = []
+        """Spectators which have the last sent frame."""
+        self._new_clients: list[socket.socket] = []
+        """Spectators which need a full frame."""
+        self._last: NDArray[np.void] | None = None
+        self._pending: NDArray[np.void] | None = None
+        self._condition = threading.Condition()
+        self._closed = False
+        self._accept_thread = threading.Thread(target=self._accept, name="SpectatorAccept", daemon=True)
+        self._send_thread = threading.Thread(target=self._run, name="Spectator", daemon=True)
+        self._accept_thread.start()
+        self._send_thread.start()
+
+    def publish(self, rgb: NDArray[np.void]) -> None:
+        """Queue a `Console.rgb` frame to be sent, replacing any frame which was not sent yet."""
+        cells = to_cells(rgb)
+        with self._condition:
+            self._pending = cells
+            self._condition.notify_all()
+
+    def wait_for_spectator(self, timeout: float | None = None) -> bool:
+        """Block until a spectator connects, return False if `timeout` passed first."""
+        with self._condition:
+            return self._condition.wait_for(lambda: bool(self._clients or self._new_clients), timeout)
+
+    def close(self) -> None:
+        """Stop the server and disconnect all spectators."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        try:
+            self._listener.shutdown(socket.SHUT_RDWR)  # Wakes the accept thread.
+        except OSError:
+            pass
+        self._listener.close()
+        self._accept_thread.join()
+        self._send_thread.join()
+        for client in (*self._clients, *self._new_clients):
+            client.close()
+        if isinstance(self.address, Path):
+            _remove_socket(self.address)
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                client, _ = self._listener.accept()
+            except OSError:
+                return  # The listener was closed.
+            if client.family != socket.AF_UNIX:
+                client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client.settimeout(SEND_TIMEOUT)
+            logger.info("Spectator connected.")
+            with self._condition:
+                if self._closed:
+                    client.close()
+                    return
+                self._new_clients.append(client)
+                self._condition.notify_all()
+
+    def _send(self, clients: list[socket.socket], data: bytes) -> list[socket.socket]:
+        """Send `data` to `clients` and return the clients which are still connected."""
+        connected = []
+        for client in clients:
+            try:
+                client.sendall(data)
+            except OSError:
+                logger.info("Spectator disconnected.")
+                client.close()
+                continue
+            self.bytes_sent += len(data)
+            connected.append(client)
+        return connected
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._closed
+                    or self._pending is not None
+                    or (bool(self._new_clients) and self._last is not None)
+                )
+                closed = self._closed
+                frame, self._pending = self._pending, None
+                if frame is not None or self._last is not None:
+                    new_clients, self._new_clients = self._new_clients, []
+                else:
+                    new_clients = []  # Nothing to send them yet.
+            if frame is not None:
+                message = encode_diff(self._last, frame)
+                if message is not None:
+                    self._clients = self._send(self._clients, message)
+                self._last = frame
+            if new_clients and self._last is not None:
+                full_frame = encode_diff(None, self._last)
+                assert full_frame is not None
+                self._clients += self._send(new_clients, _STREAM_HEADER.pack(MAGIC, VERSION) + full_frame)
+            if closed:
+                return  # The last published frame has been sent.
@@ -0,0 +1,110 @@
+import sys
+from typing import Any, Iterable
+
+import numpy as np
+from numpy.typing import NDArray
+from tcod.ec import ComponentDict
+
+import game.tiles
+from game.components import Graphic, Position
+
+LAYER_SITE = 0
+"""Draw layer of overworld sites."""
+LAYER_FEATURE = 1
+"""Draw layer of map features such as stairs."""
+LAYER_ACTOR = 2
+"""Draw layer of actors, these are drawn over everything else."""
+
+
+class SpriteBatch:
+    """Collects map objects and draws them onto a graphics array all at once.
+
+    Sprites on a higher layer are drawn over sprites on a lower layer.
+    Sprites on the same layer are drawn in the order they were added.
+
+    >>> batch = SpriteBatch()
+    >>> batch.add(Position(1, 0), Graphic(ord("@")), LAYER_ACTOR)
+    >>> batch.add(Position(1, 0), Graphic(ord(">")), LAYER_FEATURE)
+    >>> batch.add(Position(9, 9), Graphic(ord("#")))  # Out of bounds sprites are skipped.
+    >>> import tcod.console
+    >>> out = np.zeros((2, 3), dtype=tcod.console.rgb_graphic)
+    >>> batch.draw(out, (0, 0))
+    >>> out["ch"].tolist()
+    [[0, 64, 0], [0, 0, 0]]
+    """
+
+    def __init__(self, bounds: tuple[slice, ...] | None = None) -> None:
+        """Sprites outside of `bounds`, the world (i, j) slices being drawn, are skipped as they are added."""
+        self._top, self._bottom, self._left, self._right = -sys.maxsize, sys.maxsize, -sys.maxsize, sys.maxsize
+        if bounds is not None:
+            self._top, self._bottom, self._left, self._right = (
+                bounds[0].start,
+                bounds[0].stop,
+                bounds[1].start,
+                bounds[1].stop,
+            )
+        self._x: list[int] = []
+        self._y: list[int] = []
+        self._ch: list[int] = []
+        self._fg: list[tuple[int, int, int]] = []
+        self._layer: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._ch)
+
+    def _append(self, pos: Position, graphic: Graphic, layer: int) -> None:
+        self._x.append(pos.x)
+        self._y.append(pos.y)
+        self._ch.append(graphic.ch)
+        self._fg.append(graphic.fg)
+        self._layer.append(layer)
+
+    def add(self, pos: Position, graphic: Graphic, layer: int = LAYER_SITE) -> None:
+        """Add a single sprite at a world position."""
+        if self._top <= pos.y < self._bottom and self._left <= pos.x < self._right:
+            self._append(pos, graphic, layer)
+
+    def add_objects(self, objs: Iterable[ComponentDict], layer: int) -> None:
+        """Add objects with a Position and Graphic component."""
+        top, bottom, left, right = self._top, self._bottom, self._left, self._right
+        for obj in objs:
+            pos = obj[Position]
+            if top <= pos.y < bottom and left <= pos.x < right:  # Graphic is only looked up for visible objects.
+                self._append(pos, obj[Graphic], layer)
+
+    def add_sites(self, sites: dict[Position, ComponentDict], layer: int = LAYER_SITE) -> None:
+        """Add objects keyed by their position, such as `MapFeatures.sites`."""
+        top, bottom, left, right = self._top, self._bottom, self._left, self._right
+        for pos, obj in sites.items():
+            if top <= pos.y < bottom and left <= pos.x < right:
+                self._append(pos, obj[Graphic], layer)
+
+    def add_graphics(self, graphics: dict[Position, Graphic], layer: int = LAYER_SITE) -> None:
+        """Add graphics keyed by their position, such as `MemoryLayer.objs`."""
+        top, bottom, left, right = self._top, self._bottom, self._left, self._right
+        for pos, graphic in graphics.items():
+            if top <= pos.y < bottom and left <= pos.x < right:
+                self._append(pos, graphic, layer)
+
+    def draw(self, out: NDArray[Any], offset: tuple[int, int], *, dim: bool = False) -> None:
+        """Write the glyphs and foreground colors of all sprites to `out`.
+
+        `out` is a `tcod.console.rgb_graphic` array and `offset` is the world (i, j) position of `out[0, 0]`.
+        If `dim` is True then colors are darkened to match `TileDB.remembered_graphic`.
+        """
+        if not self._ch:
+            return
+        i = np.array(self._y, dtype=np.intp) - offset[0]
+        j = np.array(self._x, dtype=np.intp) - offset[1]
+        order = np.argsort(np.array(self._layer, dtype=np.intp), kind="stable")
+        order = order[(0 <= i[order]) & (i[order] < out.shape[0]) & (0 <= j[order]) & (j[order] < out.shape[1])]
+        if not order.size:
+            return
+        # Keep only the topmost sprite of each cell so that the write order of duplicate indexes doesn't matter.
+        flat_reversed = (i[order] * out.shape[1] + j[order])[::-1]
+        _, last = np.unique(flat_reversed, return_index=True)
+        order = order[order.size - 1 - last]
+        i, j = i[order], j[order]
+        fg = np.array(self._fg, dtype=np.uint8).reshape(-1, 3)[order]
+        out["ch"][i, j] = np.array(self._ch, dtype=np.int32)[order]
+        out["fg"][i, j] = game.tiles.dim_colors(fg) if dim else fg
@@ -1,3 +1,4 @@
+import logging
 from typing import Callable, Iterable
 
 import attrs
@@ -10,13 +11,20 @@
 import game.action
 import game.actions
 import game.actor_tools
+import game.autosave
 import game.commands
+import game.memory_report
+import game.mipmap
 import game.rendering
+import game.save
+import game.world_logic
 from game.components import Context, Direction, Graphic, MapFeatures, MapInfo, Position
 from game.messages import MessageLog
 from game.sched import Ticket
 from game.state import Pop, Push, Reset, State, StateResult
 
+logger = logging.getLogger(__name__)
+
 
 class InGame(State):
     def on_event(self, event: tcod.event.Event) -> StateResult:
@@ -70,10 +78,13 @@ def on_event(self, event: tcod.event.Event) -> StateResult:
                 return Push(DebugQuery())
             case tcod.event.MouseMotion(motion=motion, position=position, state=state):
                 map_info = g.world[Context].active_map[MapInfo]
-                map_info.cursor = map_info.camera_vector + Position(position.x, position.y)
+                zoom = map_info.zoom
+                map_info.cursor = map_info.camera_vector + (position.x * zoom, position.y * zoom)
                 if state & tcod.event.BUTTON_RMASK:
-                    map_info.camera_center -= motion
-                    map_info.cursor -= motion
+                    map_info.camera_center -= (motion.x * zoom, motion.y * zoom)
+                    map_info.cursor -= (motion.x * zoom, motion.y * zoom)
+            case tcod.event.MouseWheel(y=dy) if dy:
+                self.zoom(-1 if dy > 0 else 1)
             case tcod.event.WindowEvent(type="WindowLeave"):
                 g.world[Context].active_map[MapInfo].cursor = None
             case tcod.event.Quit():
@@ -86,12 +97,22 @@ def on_command(self, command: game.commands.System | game.commands.InGame) -> St
                 map_info = g.world[Context].active_map[MapInfo]
                 if map_info.cursor is None:
                     map_info.cursor = map_info.camera_center
-                map_info.cursor += (dx, dy)
+                map_info.cursor += (dx * map_info.zoom, dy * map_info.zoom)
                 map_info.camera_center = map_info.cursor
             case "CONFIRM":
                 return Push(DebugQuery())
+            case "ZOOM_IN":
+                self.zoom(-1)
+            case "ZOOM_OUT":
+                self.zoom(1)
         return None
 
+    def zoom(self, steps: int) -> None:
+        """Change the overview zoom level by a number of steps, positive steps zoom out."""
+        map_info = g.world[Context].active_map[MapInfo]
+        index = game.mipmap.ZOOM_LEVELS.index(map_info.zoom) + steps
+        map_info.zoom = game.mipmap.ZOOM_LEVELS[max(0, min(index, len(game.mipmap.ZOOM_LEVELS) - 1))]
+
     def on_draw(self, console: tcod.console.Console) -> None:
         game.rendering.render_all(g.world, console)
 
@@ -171,17 +192,28 @@ def on_cancel(self) -> StateResult:
 
 
 class MainMenu(Menu):
-    def __init__(self) -> None:
-        super().__init__(
-            [
-                MenuItem("New game", self.new_game),
-                MenuItem("Quit", self.quit),
-            ]
-        )
+    def __init__(self, *, can_continue: bool = True) -> None:
+        """Continuing from the autosave is offered if one exists and `can_continue` is True."""
+        items = [
+            MenuItem("New game", self.new_game),
+            MenuItem("Quit", self.quit),
+        ]
+        if can_continue and game.autosave.get_autosave_path().exists():
+            items.insert(0, MenuItem("Continue", self.continue_game))
+        super().__init__(items)
 
     def new_game(self) -> StateResult:
         return Reset(Overworld())
 
+    def continue_game(self) -> StateResult:
+        try:
+            g.world = game.save.load_world(game.autosave.get_autosave_path())
+        except (OSError, ValueError):
+            logger.exception("Could not load the autosave.")
+            return None
+        game.world_logic.until_player_turn(g.world)
+        return Reset(Overworld())
+
     def quit(self) -> StateResult:
         raise SystemExit()
 
@@ -194,10 +226,12 @@ def __init__(self) -> None:
         screen_pos = Position(5, 5)
         if map_info.cursor is not None:
             screen_pos = map_info.cursor - map_info.camera_vector
+            screen_pos = Position(screen_pos.x // map_info.zoom, screen_pos.y // map_info.zoom)
         options = [
             MenuItem("Build: Town", self.b_town),
             MenuItem("Debug: Cave", self.d_cave),
             MenuItem("Debug: Node", self.d_node),
+            MenuItem("Debug: Memory", self.d_memory),
         ]
         super().__init__(
             options,
@@ -205,17 +239,53 @@ def __init__(self) -> None:
             y=screen_pos.y,
         )
 
+    def add_site(self, site: ComponentDict) -> None:
+        active_map = g.world[Context].active_map
+        active_map[MapFeatures].sites[self.cursor] = site
+        game.mipmap.invalidate(active_map, *self.cursor.xy)
+
     def b_town(self) -> StateResult:
-        g.world[Context].active_map[MapFeatures].sites[self.cursor] = ComponentDict([Graphic(ord("#"))])
+        self.add_site(ComponentDict([Graphic(ord("#"))]))
         return Pop()
 
     def d_cave(self) -> StateResult:
-        g.world[Context].active_map[MapFeatures].sites[self.cursor] = ComponentDict([Graphic(ord(">"))])
+        self.add_site(ComponentDict([Graphic(ord(">"))]))
         return Pop()
 
     def d_node(self) -> StateResult:
-        g.world[Context].active_map[MapFeatures].sites[self.cursor] = ComponentDict([Graphic(ord("*"))])
+        self.add_site(ComponentDict([Graphic(ord("*"))]))
         return Pop()
 
+    def d_memory(self) -> StateResult:
+        report = game.memory_report.sample(g.world)
+        lines = game.memory_report.format_report(g.world, report)
+        logger.info("Memory report:\n%s", "\n".join(lines))
+        return Push(TextView(lines))
+
     def on_cancel(self) -> StateResult:
         return Pop()
+
+
+class TextView(State):
+    """Shows lines of text over the state below it until any key or mouse button is pressed."""
+
+    def __init__(self, lines: Iterable[str]) -> None:
+        self.lines = list(lines)
+
+    def on_event(self, event: tcod.event.Event) -> StateResult:
+        match event:
+            case tcod.event.KeyDown() | tcod.event.MouseButtonUp():
+                return Pop()
+            case tcod.event.Quit():
+                raise SystemExit()
+        return None
+
+    def on_draw(self, console: tcod.console.Console) -> None:
+        this_index = g.state.index(self)
+        if this_index > 0:
+            g.state[this_index - 1].on_draw(console)
+        width = min(console.width - 2, max(len(line) for line in self.lines) + 2)
+        height = min(console.height - 2, len(self.lines) + 2)
+        console.draw_frame(1, 1, width, height, fg=(255, 255, 255), bg=(0, 0, 0))
+        for y, line in enumerate(self.lines[: height - 2], start=2):
+            console.print(2, y, line[: width - 2], fg=(255, 255, 255))
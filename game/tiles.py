@@ -1,5 +1,6 @@
-from typing import Any, Iterable
+from typing import Any, Iterable, Self
 
+import attrs
 import numpy as np
 import tcod
 from numpy.typing import NDArray
@@ -14,15 +15,38 @@
 )
 
 
+def dim_colors(colors: NDArray[Any]) -> NDArray[Any]:
+    """Return colors darkened the way remembered tiles and objects are shown."""
+    return colors // 2
+
+
+@attrs.define(frozen=True)
+class _DerivedTables:
+    """Per-tile lookup tables computed from `TileDB.data`."""
+
+    remembered_graphic: NDArray[Any]
+    walkable: NDArray[np.bool_]
+    transparent: NDArray[np.bool_]
+    conductance: NDArray[np.float32]
+
+
 class TileDB:
     """Holds a sequence of tiles identified with string names.
 
     The int ids from this database are stable and will never become invalid.
 
     The name `""` exists as a null key returning the id of `0`.
+
+    >>> tile_db = TileDB()
+    >>> tile_db.register("floor", graphic=(ord("."), (255, 255, 255), (0, 0, 0)), transparent=True, walk_cost=1)
+    >>> tile_db.remembered_graphic[tile_db["floor"]]
+    (46, [127, 127, 127], [0, 0, 0])
+    >>> import pickle
+    >>> pickle.loads(pickle.dumps(tile_db)).data[tile_db["floor"]] == tile_db.data[tile_db["floor"]]
+    True
     """
 
-    __slots__ = ("data", "_identifiers", "_names", "__weakref__")
+    __slots__ = ("data", "_identifiers", "_names", "_derived", "__weakref__")
 
     def __init__(self, tiles: Iterable[dict[str, Any]] = ()) -> None:
         self.data: NDArray[Any] = np.zeros((1,), dtype=TILE_DTYPE)
@@ -34,6 +58,8 @@ def __init__(self, tiles: Iterable[dict[str, Any]] = ()) -> None:
         """Tile names in order of definition."""
         self._identifiers: dict[str, int] = {"": 0}
         """Mapping of string keys to tile integer ids."""
+        self._derived: _DerivedTables | None = None
+        """Cached lookup tables, cleared whenever a tile is registered."""
         for tile in tiles:
             self.register(**tile)
 
@@ -54,11 +80,51 @@ def register(
             tile_id = len(self._names)
             self._names.append(name)
             self._identifiers[name] = tile_id
-            if self.data.size >= tile_id:
-                self.data = np.pad(self.data, (0, self.data.size))
+            if tile_id >= self.data.size:
+                self.data = np.pad(self.data, (0, self.data.size))  # Double the capacity.
         self.data[tile_id] = (graphic, transparent, walk_cost)
-
-    def __getnewargs__(self) -> tuple[list[dict[str, Any]]]:
+        self._derived = None
+
+    def _get_derived(self) -> _DerivedTables:
+        """Return the derived lookup tables, rebuilding them once after any number of registrations."""
+        if self._derived is None:
+            remembered_graphic = self.data["graphic"].copy()
+            remembered_graphic["fg"] = dim_colors(remembered_graphic["fg"])
+            remembered_graphic["bg"] = dim_colors(remembered_graphic["bg"])
+            self._derived = _DerivedTables(
+                remembered_graphic=remembered_graphic,
+                walkable=self.data["walk_cost"] > 0,
+                transparent=np.ascontiguousarray(self.data["transparent"]),
+                conductance=np.divide(
+                    1,
+                    self.data["walk_cost"],
+                    out=np.zeros(len(self.data), np.float32),
+                    where=self.data["walk_cost"] > 0,
+                ),
+            )
+        return self._derived
+
+    @property
+    def remembered_graphic(self) -> NDArray[Any]:
+        """Graphics of each tile id as shown when it is remembered but not currently visible."""
+        return self._get_derived().remembered_graphic
+
+    @property
+    def walkable(self) -> NDArray[np.bool_]:
+        """True for each tile id which can be walked on."""
+        return self._get_derived().walkable
+
+    @property
+    def transparent(self) -> NDArray[np.bool_]:
+        """True for each tile id which can be seen through, as a contiguous array for fast lookups."""
+        return self._get_derived().transparent
+
+    @property
+    def conductance(self) -> NDArray[np.float32]:
+        """How easily scents and sounds spread through each tile id, the inverse of the walk cost or 0 for walls."""
+        return self._get_derived().conductance
+
+    def __reduce__(self) -> tuple[type[Self], tuple[list[dict[str, Any]]]]:
         """Serialize a database as a list of tiles to be passed to the initializer.
 
         This helps with tile changes better than if the Numpy array was serialized directly.
@@ -66,12 +132,16 @@ def __getnewargs__(self) -> tuple[list[dict[str, Any]]]:
         """
         tiles: list[dict[str, Any]] = []
         for i, name in enumerate(self._names):
-            tile = {"name": name}
-            assert self.data.dtype.names
-            for attr in self.data.dtype.names:
-                tile[attr] = self.data[i][attr].tolist()
-
-        return (tiles,)
+            ch, fg, bg = self.data[i]["graphic"].tolist()
+            tiles.append(
+                {
+                    "name": name,
+                    "graphic": (ch, tuple(fg.tolist()), tuple(bg.tolist())),
+                    "transparent": bool(self.data[i]["transparent"]),
+                    "walk_cost": int(self.data[i]["walk_cost"]),
+                }
+            )
+        return (self.__class__, (tiles,))
 
     def __getitem__(self, key: str) -> int:
         """Return the tile ID for the name `key`."""
@@ -87,3 +157,12 @@ def init(world: ComponentDict) -> None:
     tile_db.register("floor", graphic=(ord("."), (0x44, 0x44, 0x44), (0x0, 0x0, 0x0)), transparent=True, walk_cost=1)
     tile_db.register("wall", graphic=(ord(" "), (0xFF, 0xFF, 0xFF), (0x88, 0x88, 0x88)), transparent=False, walk_cost=0)
     tile_db.register("plains", graphic=(ord(","), (0xFF, 0xFF, 0xFF), (0x0, 0x44, 0x0)), transparent=True, walk_cost=2)
+    tile_db.register(
+        "ungenerated", graphic=(ord(" "), (0x0, 0x0, 0x0), (0x0, 0x0, 0x0)), transparent=False, walk_cost=0
+    )
+    tile_db.register("water", graphic=(ord("~"), (0x44, 0x88, 0xFF), (0x0, 0x0, 0x66)), transparent=True, walk_cost=0)
+    tile_db.register("sand", graphic=(ord("."), (0xCC, 0xBB, 0x88), (0x66, 0x5A, 0x33)), transparent=True, walk_cost=2)
+    tile_db.register("forest", graphic=(ord("T"), (0x22, 0xAA, 0x22), (0x0, 0x33, 0x0)), transparent=False, walk_cost=3)
+    tile_db.register(
+        "mountain", graphic=(ord("^"), (0xCC, 0xCC, 0xCC), (0x55, 0x55, 0x55)), transparent=False, walk_cost=0
+    )
@@ -0,0 +1,53 @@
+"""Tileset loading with a cache of decoded glyphs."""
+
+import hashlib
+import logging
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import tcod.tileset
+
+import game.paths
+
+logger = logging.getLogger(__name__)
+
+
+def load_tilesheet(path: Path, columns: int, rows: int, charmap: Iterable[int]) -> tcod.tileset.Tileset:
+    """Return a tileset from a tilesheet image like `tcod.tileset.load_tilesheet`.
+
+    The decoded glyphs are cached as a raw array keyed by a hash of the image and charmap.
+    Later calls load from the cache and skip PNG decoding.
+    """
+    charmap = list(charmap)
+    codepoints = list(dict.fromkeys(charmap))  # Unique codepoints in the order they were assigned.
+    key = hashlib.sha256(path.read_bytes())
+    key.update(np.array([columns, rows, *charmap], dtype=np.int64).tobytes())
+    try:
+        cache_path = game.paths.get_cache_dir() / f"tileset-{key.hexdigest()[:16]}.npy"
+    except OSError:
+        logger.warning("Tileset cache is unavailable.", exc_info=True)
+        return tcod.tileset.load_tilesheet(path, columns, rows, charmap)
+
+    if cache_path.exists():
+        try:
+            glyphs = np.load(cache_path)
+        except (OSError, ValueError):
+            logger.warning("Could not read tileset cache %s", cache_path, exc_info=True)
+        else:
+            if glyphs.ndim == 4 and glyphs.shape[0] == len(codepoints) and glyphs.shape[3] == 4:
+                tileset = tcod.tileset.Tileset(glyphs.shape[2], glyphs.shape[1])
+                for codepoint, glyph in zip(codepoints, glyphs):
+                    tileset.set_tile(codepoint, glyph)
+                return tileset
+
+    tileset = tcod.tileset.load_tilesheet(path, columns, rows, charmap)
+    glyphs = np.stack([tileset.get_tile(codepoint) for codepoint in codepoints])
+    try:
+        temp_path = cache_path.with_suffix(".tmp")
+        with temp_path.open("wb") as f:
+            np.save(f, glyphs)
+        temp_path.replace(cache_path)
+    except OSError:
+        logger.warning("Could not write tileset cache %s", cache_path, exc_info=True)
+    return tileset
@@ -1,9 +1,13 @@
 from tcod.ec import ComponentDict
 
+import game.fields
+import game.lighting
+import game.profiling
 from game.components import Context, Player
 from game.sched import Ticket
 
 
+@game.profiling.timed("until_player_turn")
 def until_player_turn(world: ComponentDict) -> None:
     ctx = world[Context]
     while True:
@@ -14,4 +18,6 @@ def until_player_turn(world: ComponentDict) -> None:
             ctx.sched.pop()
             continue
         if Player in entity:
+            game.fields.update(world)
+            game.lighting.update(world)
             return
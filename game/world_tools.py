@@ -1,17 +1,29 @@
+import random
+
 from tcod.ec import ComponentDict
 
 import game.map_tools
 import game.mapgen.world
+import game.paths
 import game.tiles
 from game.actor_tools import new_actor
-from game.components import Context, Graphic, MapDict, Player, Position
+from game.components import Context, Graphic, Light, MapDict, MapInfo, Player, Seed
 from game.messages import MessageLog
 
+MESSAGES_DIR_NAME = "messages"
+"""Directory of the message history files of each world, named by world seed."""
+
 
-def new_world() -> ComponentDict:
-    world = ComponentDict([Context(), MapDict(), MessageLog()])
+def new_world(seed: int | None = None) -> ComponentDict:
+    """Return a new world.  A random seed is used if `seed` is None."""
+    if seed is None:
+        seed = random.getrandbits(64)
+    message_log = MessageLog(spill_path=game.paths.get_data_dir() / MESSAGES_DIR_NAME / f"{seed:016x}.txt")
+    world = ComponentDict([Context(), MapDict(), message_log, Seed(seed)])
     game.tiles.init(world)
     ctx = world[Context]
     game.map_tools.activate_map(world, game.mapgen.world.WorldMap())
-    ctx.player = new_actor(world, (Position(1, 1), Graphic(ord("@")), Player()))
+    spawn = game.mapgen.world.find_spawn(world, ctx.active_map)
+    ctx.active_map[MapInfo].camera_center = spawn
+    ctx.player = new_actor(world, (spawn, Graphic(ord("@")), Player(), Light(radius=8, color=(255, 224, 176))))
     return world
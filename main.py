@@ -1,35 +1,70 @@
 #!/usr/bin/env python
+import argparse
 import logging
 import sys
+import time
 import warnings
+from pathlib import Path
 
-from tcod import tcod
+import tcod
+import tcod.context
+import tcod.event
+import tcod.tileset
 
 import g
-import game.state
+import game.autosave
+import game.events
+import game.level_cache
+import game.replay
+import game.sim
+import game.spectator
 import game.states
+import game.tileset
 import game.world_logic
 import game.world_tools
+from game.components import Seed
 
+logger = logging.getLogger(__name__)
 
-def handle_state(result: game.state.StateResult) -> None:
-    match result:
-        case game.state.Push(state):
-            g.state.append(state)
-        case game.state.Pop():
-            g.state.pop()
-        case game.state.Reset(state):
-            g.state = [state]
-        case None:
-            pass
-        case _:
-            assert False
-    if hasattr(g, "world"):
-        game.world_logic.until_player_turn(g.world)
+FRAME_RATE = 60
+"""Maximum number of frames presented per second."""
+MAX_KEY_REPEATS = 1
+"""Maximum number of key repeat events handled per frame."""
+
+
+def convert_events(events: list[tcod.event.Event]) -> list[tcod.event.Event]:
+    """Coalesce and convert a burst of events on the main thread."""
+    converted = []
+    for event in game.events.coalesce(events, MAX_KEY_REPEATS):
+        converted.append(g.context.convert_event(event))
+        match event:
+            case tcod.event.MouseButtonDown():
+                tcod.lib.SDL_CaptureMouse(True)
+            case tcod.event.MouseButtonUp():
+                if tcod.event.get_mouse_state().state == 0:
+                    tcod.lib.SDL_CaptureMouse(False)
+    return converted
 
 
 def main() -> None:
-    tileset = tcod.tileset.load_tilesheet("data/dejavu16x16_gs_tc.png", 32, 8, tcod.tileset.CHARMAP_TCOD)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--exit-after-first-frame", action="store_true", help="quit once the first frame is presented")
+    parser.add_argument("--seed", type=int, help="world seed, random by default")
+    parser.add_argument("--record", type=Path, metavar="PATH", help="record this session for tools.replay")
+    parser.add_argument("--no-autosave", action="store_true", help="do not save the game while it is played")
+    parser.add_argument("--no-level-cache", action="store_true", help="always generate levels instead of loading them")
+    parser.add_argument(
+        "--spectate",
+        nargs="?",
+        const=str(game.spectator.DEFAULT_PORT),
+        metavar="ADDRESS",
+        help="stream frames to tools.spectate on a port, HOST:PORT, or Unix socket path",
+    )
+    args = parser.parse_args()
+    game.level_cache.set_enabled(not args.no_level_cache)
+
+    start_time = time.perf_counter()
+    tileset = game.tileset.load_tilesheet(Path("data/dejavu16x16_gs_tc.png"), 32, 8, tcod.tileset.CHARMAP_TCOD)
 
     with tcod.context.new(
         tileset=tileset,
@@ -38,21 +73,53 @@ def main() -> None:
         title="7drl-2023",
         vsync=True,
     ) as g.context:
-        g.world = game.world_tools.new_world()
-        g.state = [game.states.MainMenu()]
-        while True:
-            console = g.context.new_console(30, 20)
-            g.state[-1].on_draw(console)
-            g.context.present(console, keep_aspect=True, integer_scaling=True)
-            for event in tcod.event.wait():
-                event = g.context.convert_event(event)
-                handle_state(g.state[-1].on_event(event))
-                match event:
-                    case tcod.event.MouseButtonDown():
-                        tcod.lib.SDL_CaptureMouse(True)
-                    case tcod.event.MouseButtonUp():
-                        if tcod.event.get_mouse_state().state == 0:
-                            tcod.lib.SDL_CaptureMouse(False)
+        g.world = game.world_tools.new_world(args.seed)
+        g.state = [game.states.MainMenu(can_continue=args.record is None)]  # Recordings always start a new game.
+        game.world_logic.until_player_turn(g.world)
+        recorder = game.replay.Recorder(args.record, g.world[Seed].value) if args.record else None
+        autosave = None if args.no_autosave else game.autosave.Autosave(game.autosave.get_autosave_path())
+        frames = game.sim.FrameBuffer()
+        spectator = (
+            game.spectator.SpectatorServer(game.spectator.parse_address(args.spectate)) if args.spectate else None
+        )
+        simulation = game.sim.SimulationThread(frames, recorder, autosave, spectator)
+        simulation.start()
+        submitted_size = None
+        presented_serial = 0
+        next_frame = time.perf_counter()
+        try:
+            while simulation.is_alive():
+                events = list(tcod.event.get())
+                # Collect events until the next frame is due so that bursts are handled together.
+                while (remaining := next_frame - time.perf_counter()) > 0:
+                    events.extend(tcod.event.wait(timeout=remaining))
+                next_frame = time.perf_counter() + 1 / FRAME_RATE
+                console_size = g.context.recommended_console_size(30, 20)
+                if events or console_size != submitted_size:
+                    simulation.submit(convert_events(events), console_size)
+                    submitted_size = console_size
+                if frames.serial == presented_serial and not events:
+                    continue
+                console = g.context.new_console(30, 20)
+                first_frame = presented_serial == 0
+                presented_serial = frames.read(console.rgb)
+                g.context.present(console, keep_aspect=True, integer_scaling=True)
+                if first_frame and presented_serial:
+                    logger.info("Time to first frame: %.3f seconds", time.perf_counter() - start_time)
+                    if args.exit_after_first_frame:
+                        break
+        finally:
+            simulation.stop()
+            if recorder is not None or autosave is not None:
+                simulation.join()
+            if recorder is not None:
+                recorder.close()
+            if autosave is not None:
+                autosave.close()
+            if spectator is not None:
+                spectator.close()
+        if simulation.error is not None:
+            raise simulation.error
 
 
 if __name__ == "__main__":
@@ -0,0 +1 @@
+"""Development tools which run the game headless, such as benchmarks."""
@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+"""Benchmarks of core subsystems with a history of results for spotting regressions.
+
+Run with `python -m tools.bench`, no display is needed.
+Each run is appended to a JSON lines history file and compared to the previous run in it.
+Use `--list` to show the available benchmarks and `-k NAME` to run only benchmarks whose names contain NAME.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator, NamedTuple
+
+import numpy as np
+import tcod.console
+import tcod.event
+
+import game.actions
+import game.actor_tools
+import game.commands
+import game.connectivity
+import game.fields
+import game.level_cache
+import game.los
+import game.map_tools
+import game.rendering
+import game.snapshots
+import game.world_tools
+import tools.render_bench
+from game.actor_types import ActiveFOV
+from game.components import Context, Direction, MapFeatures, Position, Stairway
+from game.map import Map
+from game.map_attrs import a_tiles
+from game.mapgen.caves import CaveMap
+from game.sched import TurnQueue
+from game.tiles import TileDB
+
+ROOT_DIR = Path(__file__).parent.parent
+DEFAULT_HISTORY = Path(__file__).parent / "bench_history.jsonl"
+REGRESSION_THRESHOLD = 0.10
+"""Relative slowdown from the previous run which is reported as a regression."""
+
+
+class Benchmark(NamedTuple):
+    name: str
+    setup: Callable[[], Callable[[], object]]
+    """Prepares the benchmark and returns the function to time."""
+
+
+def bench_cave_generate(size: int) -> Callable[[], Callable[[], object]]:
+    def setup() -> Callable[[], object]:
+        world = game.world_tools.new_world(0)
+        key = CaveMap(1, width=size, height=size)
+        return lambda: key.generate(world)
+
+    return setup
+
+
+def bench_cave_load(size: int) -> Callable[[], Callable[[], object]]:
+    def setup() -> Callable[[], object]:
+        world = game.world_tools.new_world(0)
+        key = CaveMap(1, width=size, height=size)
+        game.level_cache.generate(world, key)  # Make sure the level is cached.
+        return lambda: game.level_cache.generate(world, key)
+
+    return setup
+
+
+def bench_compute_fov() -> Callable[[], object]:
+    world = game.world_tools.new_world(0)
+    player = world[Context].player
+    walkable = world[TileDB].walkable[world[Context].active_map[Map][a_tiles]]
+    positions = [Position(int(x), int(y)) for y, x in zip(*walkable.nonzero())][::97]
+    index = 0
+
+    def run() -> None:
+        nonlocal index
+        index = (index + 1) % len(positions)
+        player[Position] = positions[index]
+        if ActiveFOV in player:
+            del player[ActiveFOV]
+        game.actor_tools.compute_fov(world, player)
+
+    return run
+
+
+def bench_connectivity(queries: bool) -> Callable[[], Callable[[], object]]:
+    def setup() -> Callable[[], object]:
+        world = game.world_tools.new_world(0)
+        map_entity = game.map_tools.get_map(world, CaveMap(1, width=200, height=200))
+        regions = game.connectivity.get_connectivity(world, map_entity)
+        if not queries:
+            return lambda: regions.rebuild(world[TileDB].walkable[map_entity[Map][a_tiles]])
+        rng = np.random.default_rng(0)
+        positions = [Position(int(x), int(y)) for x, y in rng.integers(200, size=(1000, 2))]
+
+        def run() -> None:
+            for a, b in zip(positions, positions[1:]):
+                regions.is_connected(a, b)
+
+        return run
+
+    return setup
+
+
+def bench_fields_update() -> Callable[[], object]:
+    world = game.world_tools.new_world(0)
+    ctx = world[Context]
+    ctx.active_map = game.map_tools.new_map(world, 500, 500)
+    player = ctx.player
+    player[Position] = Position(250, 250)
+    rng = np.random.default_rng(0)
+
+    def run() -> None:
+        """Wander around the middle of the map for one turn, leaving a scent trail and footsteps behind."""
+        step = rng.integers(-1, 2, size=2)
+        player[Position] = Position(
+            int(np.clip(player[Position].x + step[0], 200, 300)), int(np.clip(player[Position].y + step[1], 200, 300))
+        )
+        game.fields.emit(world, game.fields.SOUND, player[Position], game.fields.FOOTSTEP_SOUND)
+        ctx.sched.time += game.fields.TURN_TIME
+        game.fields.update(world)
+
+    for _ in range(500):  # Let the trail build up.
+        run()
+    return run
+
+
+def bench_los_lines() -> Callable[[], object]:
+    world = game.world_tools.new_world(0)
+    map_entity = game.map_tools.get_map(world, CaveMap(1, width=100, height=100))
+    rng = np.random.default_rng(0)
+    sources = rng.integers(100, size=(1000, 2))
+    targets = np.clip(sources + rng.integers(-10, 11, size=(1000, 2)), 0, 99)
+    return lambda: game.los.check_lines(world, map_entity, sources, targets)
+
+
+def bench_render_map(scenario: tools.render_bench.Scenario) -> Callable[[], Callable[[], object]]:
+    def setup() -> Callable[[], object]:
+        world = tools.render_bench.build_world(scenario)
+        console = tcod.console.Console(80, 45, order="C")
+        game.rendering.render_map(world, console.rgb)  # Warm up caches.
+        return lambda: game.rendering.render_map(world, console.rgb)
+
+    return setup
+
+
+def bench_keybindings_parse() -> Callable[[], object]:
+    events = [
+        tcod.event.KeyDown(tcod.event.Scancode.UP, tcod.event.KeySym.UP, tcod.event.Modifier.NONE),
+        tcod.event.KeyDown(tcod.event.Scancode.PERIOD, tcod.event.KeySym.PERIOD, tcod.event.Modifier.LSHIFT),
+        tcod.event.KeyDown(tcod.event.Scancode.KP_5, tcod.event.KeySym.KP_5, tcod.event.Modifier.NUM),
+        tcod.event.KeyDown(tcod.event.Scancode.Q, tcod.event.KeySym.q, tcod.event.Modifier.NONE),
+    ]
+    keybindings = game.commands.keybindings
+
+    def run() -> None:
+        for event in events:
+            keybindings.parse(event, game.commands.InGame)
+
+    return run
+
+
+def bench_turn_queue() -> Callable[[], object]:
+    def run() -> None:
+        queue: TurnQueue[int] = TurnQueue()
+        for i in range(10_000):
+            queue.schedule(i * 7919 % 1000, i)
+        for _ in range(10_000):
+            ticket = queue.pop()
+            queue.schedule(100, ticket.value)
+
+    return run
+
+
+def bench_move() -> Callable[[], object]:
+    world = game.world_tools.new_world(0)
+    game.map_tools.activate_map(world, game.map_tools.TestMap(0))  # An open room, so both moves always succeed.
+    player = world[Context].player
+    player[Position] = Position(10, 10)
+    moves = [game.actions.Move([Direction(1, 0)]), game.actions.Move([Direction(-1, 0)])]
+    index = 0
+
+    def run() -> None:
+        nonlocal index
+        index ^= 1
+        moves[index].perform(world, player)
+
+    return run
+
+
+def bench_use_stairs() -> Callable[[], object]:
+    world = game.world_tools.new_world(0)
+    player = world[Context].player
+    game.map_tools.activate_map(world, game.map_tools.TestMap(0))
+    stairs = next(obj for obj in world[Context].active_map[MapFeatures].features if Stairway in obj)
+    player[Position] = stairs[Position]
+    down = game.actions.UseStairs(["down"])
+    up = game.actions.UseStairs(["up"])
+    down.perform(world, player)  # Generate the lower level outside of the timed function.
+    up.perform(world, player)
+
+    def run() -> None:
+        down.perform(world, player)
+        up.perform(world, player)
+
+    return run
+
+
+def bench_snapshot(restore: bool) -> Callable[[], Callable[[], object]]:
+    def setup() -> Callable[[], object]:
+        """Snapshots of a player walking back and forth, each turn is taken after one move."""
+        world = game.world_tools.new_world(0)
+        game.map_tools.activate_map(world, game.map_tools.TestMap(0))
+        player = world[Context].player
+        player[Position] = Position(10, 10)
+        moves = [game.actions.Move([Direction(1, 0)]), game.actions.Move([Direction(-1, 0)])]
+        history = game.snapshots.History()
+        index = 0
+
+        def take() -> None:
+            nonlocal index
+            index ^= 1
+            moves[index].perform(world, player)
+            history.take(world)
+
+        for _ in range(10):
+            take()
+        if restore:
+            return lambda: history.restore(history.snapshots[-1])
+        return take
+
+    return setup
+
+
+def bench_tiledb_register() -> Callable[[], object]:
+    def run() -> None:
+        tile_db = TileDB()
+        for i in range(256):
+            tile_db.register(f"tile{i}", graphic=(i, (i, i, i), (0, 0, 0)), transparent=i % 2 == 0, walk_cost=i % 3)
+        tile_db.walkable  # Rebuild the derived tables once.
+
+    return run
+
+
+BENCHMARKS = [
+    *(Benchmark(f"cave_generate[{size}]", bench_cave_generate(size)) for size in (50, 100, 200)),
+    Benchmark("cave_load[200]", bench_cave_load(200)),
+    Benchmark("compute_fov", bench_compute_fov),
+    Benchmark("connectivity_build", bench_connectivity(False)),
+    Benchmark("connectivity_query", bench_connectivity(True)),
+    Benchmark("fields_update[500]", bench_fields_update),
+    Benchmark("los_lines[1000]", bench_los_lines),
+    *(Benchmark(f"render_map[{s.name}]", bench_render_map(s)) for s in tools.render_bench.SCENARIOS),
+    Benchmark("keybindings_parse", bench_keybindings_parse),
+    Benchmark("turn_queue", bench_turn_queue),
+    Benchmark("move", bench_move),
+    Benchmark("use_stairs", bench_use_stairs),
+    Benchmark("snapshot_take", bench_snapshot(False)),
+    Benchmark("snapshot_restore", bench_snapshot(True)),
+    Benchmark("tiledb_register", bench_tiledb_register),
+]
+
+
+def measure(func: Callable[[], object], repeat: int, min_time: float) -> list[float]:
+    """Return the seconds per call of `repeat` rounds, each round runs for at least `min_time` seconds."""
+
+    def time_calls(calls: int) -> float:
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        return time.perf_counter() - start
+
+    calls = 1
+    while (elapsed := time_calls(calls)) < min_time:  # Find a number of calls per round taking at least `min_time`.
+        calls = max(calls * 2, int(calls * min_time / elapsed * 1.1)) if elapsed > 0 else calls * 10
+    return [time_calls(calls) / calls for _ in range(repeat)]
+
+
+def get_commit() -> str | None:
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def read_history(path: Path) -> Iterator[dict[str, Any]]:
+    if not path.exists():
+        return
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f}{unit}"
+    return f"{seconds / 1e-9:.1f}ns"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="filter", help="only run benchmarks whose names contain this text")
+    parser.add_argument("--list", action="store_true", help="list benchmarks and exit")
+    parser.add_argument("--repeat", type=int, default=5, help="timed rounds per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per round")
+    parser.add_argument("--history", type=Path, default=DEFAULT_HISTORY, help="JSON lines file of past results")
+    parser.add_argument("--no-save", action="store_true", help="do not append this run to the history")
+    args = parser.parse_args()
+
+    benchmarks = [bench for bench in BENCHMARKS if not args.filter or args.filter in bench.name]
+    if args.list:
+        for bench in benchmarks:
+            print(bench.name)
+        return
+
+    previous: dict[str, float] = {}
+    for entry in read_history(args.history):
+        for name, result in entry["results"].items():
+            previous[name] = result["median"]
+
+    results = {}
+    regressions = 0
+    print(f"{'benchmark':<24} {'median':>10} {'min':>10}  change")
+    for bench in benchmarks:
+        rounds = measure(bench.setup(), args.repeat, args.min_time)
+        median = statistics.median(rounds)
+        results[bench.name] = {"median": median, "min": min(rounds), "rounds": rounds}
+        change = ""
+        if bench.name in previous:
+            ratio = median / previous[bench.name] - 1
+            change = f"{ratio:+.1%}"
+            if ratio > REGRESSION_THRESHOLD:
+                change += "  REGRESSION"
+                regressions += 1
+        print(f"{bench.name:<24} {format_time(median):>10} {format_time(min(rounds)):>10}  {change}")
+
+    if not args.no_save:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": get_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }
+        with args.history.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+    if regressions:
+        print(f"{regressions} benchmarks are more than {REGRESSION_THRESHOLD:.0%} slower than the previous run.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
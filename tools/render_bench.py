@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""Offscreen render benchmark with golden frame checks.
+
+Run with `python -m tools.render_bench`.
+Use `--update-golden` after an intentional change to the rendered output.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import attrs
+import numpy as np
+import tcod.console
+from numpy.typing import NDArray
+from tcod.ec import ComponentDict
+
+import game.map_tools
+import game.rendering
+import game.world_tools
+from game import map_attrs
+from game.actor_tools import new_actor
+from game.components import Context, Graphic, MapFeatures, MapInfo, Position
+from game.map import Map, MapKey
+from game.tiles import TileDB
+
+GOLDEN_DIR = Path(__file__).parent / "golden"
+
+
+@attrs.define(frozen=True)
+class BenchMap(MapKey):
+    """A plains map of any size used for render benchmarks."""
+
+    width: int
+    height: int
+
+    def generate(self, world: ComponentDict) -> ComponentDict:
+        map = game.map_tools.new_map(world, self.width, self.height)
+        map[Map][map_attrs.a_tiles][:] = world[TileDB]["plains"]
+        map[Map][map_attrs.a_tiles][::7, ::5] = world[TileDB]["floor"]
+        return map
+
+
+class Scenario(NamedTuple):
+    name: str
+    width: int
+    height: int
+    actors: int
+    sites: int
+
+
+SCENARIOS = [
+    Scenario("small", 60, 40, actors=10, sites=10),
+    Scenario("medium", 250, 250, actors=500, sites=200),
+    Scenario("large", 1000, 1000, actors=5000, sites=2000),
+]
+
+
+def build_world(scenario: Scenario, seed: int = 0) -> ComponentDict:
+    """Return a new world with the player on a map matching `scenario`."""
+    world = game.world_tools.new_world(seed)
+    game.map_tools.activate_map(world, BenchMap(scenario.width, scenario.height))
+    rng = np.random.default_rng(seed)
+    active_map = world[Context].active_map
+    glyphs = np.frombuffer(b"abcdefghijklmnopqrstuvwxyz", dtype=np.uint8)
+    # Actors are kept in a set, so they are placed on distinct cells to keep their draw order deterministic.
+    cells = rng.choice(scenario.width * scenario.height, size=scenario.actors + 1, replace=False)
+    player_cell = int(cells[0])
+    world[Context].player[Position] = Position(player_cell % scenario.width, player_cell // scenario.width)
+    for cell, ch in zip(cells[1:].tolist(), rng.choice(glyphs, size=scenario.actors).tolist()):
+        new_actor(world, (Position(cell % scenario.width, cell // scenario.width), Graphic(ch, (0xFF, 0x80, 0x0))))
+    for x, y in zip(
+        rng.integers(scenario.width, size=scenario.sites).tolist(),
+        rng.integers(scenario.height, size=scenario.sites).tolist(),
+    ):
+        active_map[MapFeatures].sites[Position(x, y)] = ComponentDict([Graphic(ord("#"), (0x80, 0x80, 0xFF))])
+    active_map[MapInfo].camera_center = Position(scenario.width // 2, scenario.height // 2)
+    return world
+
+
+def time_frames(world: ComponentDict, console: tcod.console.Console, frames: int) -> NDArray[np.float64]:
+    """Render `frames` frames and return the time taken by each in seconds."""
+    times = np.zeros(frames, dtype=np.float64)
+    for i in range(frames):
+        start = time.perf_counter()
+        game.rendering.render_all(world, console)
+        times[i] = time.perf_counter() - start
+    return times
+
+
+def check_golden(name: str, rgb: NDArray[Any], update: bool) -> bool:
+    """Compare a frame to its stored golden frame, or store it if `update` is True."""
+    path = GOLDEN_DIR / f"{name}.npz"
+    if update:
+        GOLDEN_DIR.mkdir(exist_ok=True)
+        np.savez_compressed(path, rgb=rgb)
+        return True
+    if not path.exists():
+        print(f"{name}: missing golden frame {path}", file=sys.stderr)
+        return False
+    with np.load(path) as golden:
+        expected = golden["rgb"]
+    if expected.shape != rgb.shape or expected.dtype != rgb.dtype:
+        print(f"{name}: golden frame has shape {expected.shape}, got {rgb.shape}", file=sys.stderr)
+        return False
+    mismatched = np.argwhere(expected != rgb)
+    if mismatched.size:
+        y, x = mismatched[0].tolist()
+        print(f"{name}: {len(mismatched)} cells differ, first at {x},{y}", file=sys.stderr)
+        return False
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=100, help="number of timed frames per scenario")
+    parser.add_argument("--width", type=int, default=80, help="console width")
+    parser.add_argument("--height", type=int, default=45, help="console height")
+    parser.add_argument("--scenario", action="append", choices=[s.name for s in SCENARIOS], help="limit scenarios")
+    parser.add_argument("--update-golden", action="store_true", help="store the rendered frames as golden frames")
+    args = parser.parse_args()
+
+    ok = True
+    print(f"{'scenario':<10} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}  golden")
+    for scenario in SCENARIOS:
+        if args.scenario and scenario.name not in args.scenario:
+            continue
+        world = build_world(scenario)
+        console = tcod.console.Console(args.width, args.height, order="C")
+        game.rendering.render_all(world, console)  # Warm up caches.
+        golden_ok = check_golden(f"{scenario.name}_{args.width}x{args.height}", console.rgb, args.update_golden)
+        ok &= golden_ok
+        p50, p90, p99, p100 = np.percentile(time_frames(world, console, args.frames), [50, 90, 99, 100]) * 1000
+        print(f"{scenario.name:<10} {p50:8.3f} {p90:8.3f} {p99:8.3f} {p100:8.3f}  {'ok' if golden_ok else 'FAILED'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
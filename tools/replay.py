@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""Replay a session recorded with `main.py --record PATH` headless and report its timing.
+
+Run with `python -m tools.replay PATH`.
+Use `--profile OUT` to save cProfile stats of the replay, which can be viewed with `python -m pstats OUT`.
+Use `--spectate [ADDRESS]` to stream the replayed frames to `tools.spectate`, the replay starts once it connects.
+"""
+
+import argparse
+import cProfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+import game.replay
+import game.spectator
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", type=Path, help="recorded session")
+    parser.add_argument("--profile", type=Path, metavar="OUT", help="write cProfile stats to this file")
+    parser.add_argument(
+        "--spectate",
+        nargs="?",
+        const=str(game.spectator.DEFAULT_PORT),
+        metavar="ADDRESS",
+        help="stream frames to spectators on a port, HOST:PORT, or Unix socket path",
+    )
+    args = parser.parse_args()
+
+    spectator = game.spectator.SpectatorServer(game.spectator.parse_address(args.spectate)) if args.spectate else None
+    if spectator is not None:
+        print(f"Waiting for a spectator on {args.spectate}")
+        spectator.wait_for_spectator()
+
+    profile = cProfile.Profile() if args.profile else None
+    start = time.perf_counter()
+    if profile is not None:
+        profile.enable()
+    try:
+        stats = game.replay.replay(args.recording, spectator)
+    finally:
+        if spectator is not None:
+            spectator.close()
+    if profile is not None:
+        profile.disable()
+        profile.dump_stats(args.profile)
+    total = time.perf_counter() - start
+
+    print(f"{stats.batches} batches, {stats.events} events in {total:.3f}s")
+    if stats.batch_times:
+        p50, p90, p99, p100 = np.percentile(stats.batch_times, [50, 90, 99, 100]) * 1000
+        print(f"batch ms: p50 {p50:.3f}, p90 {p90:.3f}, p99 {p99:.3f}, max {p100:.3f}")
+    if spectator is not None:
+        print(f"{spectator.bytes_sent} bytes sent to spectators")
+    if stats.mismatched_commands:
+        print(f"warning: {stats.mismatched_commands} key presses parsed differently than when recorded")
+
+
+if __name__ == "__main__":
+    main()
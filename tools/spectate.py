@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""Watch a session streamed by `main.py --spectate` or `tools.replay --spectate`.
+
+Run with `python -m tools.spectate [ADDRESS]`, the address defaults to the default port on this machine.
+Use `--headless` to only report the frames and bytes received, no display is needed.
+"""
+
+import argparse
+import threading
+import time
+from pathlib import Path
+from typing import IO
+
+import numpy as np
+import tcod.console
+import tcod.context
+import tcod.event
+import tcod.tileset
+from numpy.typing import NDArray
+
+import game.spectator
+import game.tileset
+
+FRAME_RATE = 60
+"""Maximum number of frames presented per second."""
+
+
+class Receiver(threading.Thread):
+    """Reads frames from a stream in the background, so that the window stays responsive."""
+
+    def __init__(self, stream: IO[bytes]) -> None:
+        super().__init__(name="Receiver", daemon=True)
+        self.stream = stream
+        self.decoder = game.spectator.FrameDecoder()
+        self.serial = 0
+        """Incremented for each frame received."""
+        self._lock = threading.Lock()
+        self._frame: NDArray[np.void] | None = None
+
+    def run(self) -> None:
+        while self.decoder.read(self.stream):
+            assert self.decoder.frame is not None
+            with self._lock:
+                self._frame = self.decoder.frame.copy()
+                self.serial += 1
+
+    def get_frame(self) -> tuple[NDArray[np.void] | None, int]:
+        """Return the latest frame and its serial number."""
+        with self._lock:
+            return self._frame, self.serial
+
+
+def watch(stream: IO[bytes]) -> None:
+    receiver = Receiver(stream)
+    receiver.start()
+    tileset = game.tileset.load_tilesheet(Path("data/dejavu16x16_gs_tc.png"), 32, 8, tcod.tileset.CHARMAP_TCOD)
+    with tcod.context.new(tileset=tileset, width=1280, height=720, title="7drl-2023 spectator", vsync=True) as context:
+        presented_serial = 0
+        while receiver.is_alive() or receiver.serial != presented_serial:
+            for event in tcod.event.wait(timeout=1 / FRAME_RATE):
+                if isinstance(event, tcod.event.Quit):
+                    return
+            frame, serial = receiver.get_frame()
+            if frame is None or serial == presented_serial:
+                continue
+            console = tcod.console.Console(frame.shape[1], frame.shape[0])
+            console.rgb[...] = frame
+            context.present(console, keep_aspect=True, integer_scaling=True)
+            presented_serial = serial
+
+
+def report(stream: IO[bytes]) -> None:
+    decoder = game.spectator.FrameDecoder()
+    frames = 0
+    start = time.perf_counter()
+    while decoder.read(stream):
+        frames += 1
+    elapsed = time.perf_counter() - start
+    print(f"{frames} frames, {decoder.bytes_read} bytes in {elapsed:.3f}s")
+    if frames:
+        print(f"{decoder.bytes_read / frames:.0f} bytes per frame")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "address",
+        nargs="?",
+        default=str(game.spectator.DEFAULT_PORT),
+        help="port, HOST:PORT, or Unix socket path of the game",
+    )
+    parser.add_argument("--headless", action="store_true", help="report the stream instead of showing it")
+    args = parser.parse_args()
+
+    with game.spectator.connect(game.spectator.parse_address(args.address)) as sock, sock.makefile("rb") as stream:
+        game.spectator.read_stream_header(stream)
+        if args.headless:
+            report(stream)
+        else:
+            watch(stream)
+
+
+if __name__ == "__main__":
+    main()
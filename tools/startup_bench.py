@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+"""Measure the time from launching the game to its first presented frame.
+
+Run with `python -m tools.startup_bench`.
+On a machine without a display set `SDL_VIDEODRIVER=dummy` and `SDL_RENDER_DRIVER=software`.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+
+
+def time_startup() -> float:
+    """Launch the game once and return the seconds until it exits after its first frame."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-O", "main.py", "--exit-after-first-frame"], cwd=ROOT_DIR, check=True)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="number of launches to measure")
+    args = parser.parse_args()
+
+    times = [time_startup() for _ in range(args.runs)]
+    print(f"time to first frame: median {statistics.median(times):.3f}s, min {min(times):.3f}s, max {max(times):.3f}s")
+
+
+if __name__ == "__main__":
+    main()